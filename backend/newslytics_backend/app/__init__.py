@@ -1,6 +1,8 @@
 from flask import Flask, jsonify
 from .config import Config
-from .models import db
+from .identity import init_identity
+from .models import db, ensure_indexes
+from .responses import OrjsonProvider, compress_response
 from flask_jwt_extended import JWTManager
 from flask_cors import CORS
 
@@ -9,15 +11,20 @@ jwt = JWTManager()
 def create_app():
     app = Flask(__name__)
     app.config.from_object(Config)
+    app.json = OrjsonProvider(app)
 
     CORS(app)
 
     db.init_app(app)
     jwt.init_app(app)
+    init_identity(jwt)
+    app.after_request(compress_response)
 
-    with app.app_context():
-        from . import models
-        db.create_all()
+    if app.config["CREATE_SCHEMA"]:
+        with app.app_context():
+            from . import models
+            db.create_all()
+            ensure_indexes()
 
     @app.route("/")
     def index():
@@ -27,4 +34,19 @@ def create_app():
     from .routes import api_bp
     app.register_blueprint(api_bp, url_prefix="/api")
 
+    # Market-Data-Routen (yfinance wird erst bei Bedarf importiert)
+    from .market import configure as configure_market, market_bp, preload
+    app.register_blueprint(market_bp, url_prefix="/api")
+    configure_market(app.config)
+    if app.config["PRELOAD_MARKETDATA"]:
+        preload()
+
+    # Server-Sent Events (Chat-Einträge, Kurs-Updates)
+    from .stream import stream_bp
+    app.register_blueprint(stream_bp, url_prefix="/api")
+
+    # CLI-Kommandos (flask importtime, ...)
+    from .cli import register_cli
+    register_cli(app)
+
     return app
@@ -0,0 +1,47 @@
+"""
+Archivierung alter Chat-Einträge.
+
+Einträge, die älter als CHAT_ARCHIVE_AFTER_DAYS sind, wandern mit unveränderter
+id von chat_entries nach chat_entries_archive (`flask archive-chats`, z.B. per
+Cron). Verschoben wird in Batches (INSERT ... SELECT + DELETE, je ein Commit),
+damit keine langen Sperren entstehen. Die heiße Tabelle bleibt so klein; ihre
+Indizes und die Abfragen für Chatbot-Kontext, neueste Seite und Delta
+berühren das Archiv nicht.
+"""
+from sqlalchemy import insert, select
+
+from .models import db, ChatEntry, ChatEntryArchive
+
+_COLUMNS = ("id", "sender", "text", "datetime", "chat_id")
+
+
+def archive_chat_entries(older_than, batch_size: int = 5000):
+    """
+    Verschiebt alle Einträge mit datetime < older_than ins Archiv.
+    Liefert (Anzahl verschobener Einträge, IDs der betroffenen Chats).
+    """
+    moved = 0
+    chat_ids = set()
+    while True:
+        rows = (
+            db.session.query(ChatEntry.id, ChatEntry.chat_id)
+            .filter(ChatEntry.datetime < older_than)
+            .order_by(ChatEntry.id)
+            .limit(batch_size)
+            .all()
+        )
+        if not rows:
+            break
+        ids = [entry_id for entry_id, _ in rows]
+        chat_ids.update(chat_id for _, chat_id in rows)
+
+        db.session.execute(
+            insert(ChatEntryArchive).from_select(
+                _COLUMNS,
+                select(*(getattr(ChatEntry, c) for c in _COLUMNS)).where(ChatEntry.id.in_(ids)),
+            )
+        )
+        db.session.query(ChatEntry).filter(ChatEntry.id.in_(ids)).delete(synchronize_session=False)
+        db.session.commit()
+        moved += len(ids)
+    return moved, sorted(chat_ids)
@@ -0,0 +1,180 @@
+"""
+Serverseitiger Prompt-Kontext für die Chatbots.
+
+Statt dass der Client bei jedem Turn den kompletten Verlauf mitschickt, wird
+der Kontext aus den gespeicherten ChatEntry-Zeilen gebaut:
+- die letzten RECENT_ENTRIES Einträge im Wortlaut
+- ältere Nutzerfragen als kurze Zusammenfassung (max. SUMMARY_TOPICS)
+- Stammdaten der Aktie (get_company_info_cached) bzw. Positionen des Portfolios
+
+Der Verlaufs-Teil wird pro Chat gecacht und bei jedem neuen Eintrag
+inkrementell fortgeschrieben, damit der Aufwand nicht mit der Chatlänge wächst.
+"""
+import threading
+from collections import deque
+
+from sqlalchemy import and_, func, or_
+
+from .models import db, Aktie, ChatEntry, ChatTypeEnum, Portfolio, SenderEnum
+from .positions import open_positions
+
+RECENT_ENTRIES = 10
+SUMMARY_TOPICS = 20
+SUMMARY_TOPIC_CHARS = 80
+
+CHAT_CONTEXT_CACHE = {}  # Key: chat_id -> {"last_entry_id", "entry_count", "recent": deque, "summary": deque}
+_lock = threading.Lock()
+
+
+def _entry_view(entry: dict) -> dict:
+    return {"sender": entry["sender"], "text": entry["text"]}
+
+
+def _fold(state: dict, entry: dict):
+    """Nimmt einen neuen Eintrag in den Zustand auf; verdrängte Nutzerfragen wandern in die Zusammenfassung."""
+    recent = state["recent"]
+    if len(recent) == recent.maxlen:
+        dropped = recent[0]
+        if dropped["sender"] == SenderEnum.USER.value:
+            state["summary"].append(dropped["text"][:SUMMARY_TOPIC_CHARS])
+    recent.append(_entry_view(entry))
+    state["entry_count"] += 1
+    state["last_entry_id"] = max(state["last_entry_id"], entry["id"])
+
+
+def _load_state(chat_id: int) -> dict:
+    """Erstaufbau aus der DB: nur die letzten Einträge + ältere Nutzerfragen, nie der ganze Chat."""
+    recent_rows = (
+        ChatEntry.query.filter_by(chat_id=chat_id)
+        .order_by(ChatEntry.datetime.desc(), ChatEntry.id.desc())
+        .limit(RECENT_ENTRIES)
+        .all()
+    )
+    recent_rows.reverse()
+
+    older_questions = []
+    if recent_rows:
+        oldest = recent_rows[0]
+        older_questions = (
+            db.session.query(ChatEntry.text)
+            .filter(
+                ChatEntry.chat_id == chat_id,
+                ChatEntry.sender == SenderEnum.USER,
+                or_(
+                    ChatEntry.datetime < oldest.datetime,
+                    and_(ChatEntry.datetime == oldest.datetime, ChatEntry.id < oldest.id),
+                ),
+            )
+            .order_by(ChatEntry.datetime.desc(), ChatEntry.id.desc())
+            .limit(SUMMARY_TOPICS)
+            .all()
+        )
+        older_questions.reverse()
+
+    entry_count = db.session.query(func.count(ChatEntry.id)).filter_by(chat_id=chat_id).scalar()
+
+    return {
+        "last_entry_id": max((e.id for e in recent_rows), default=0),
+        "entry_count": entry_count,
+        "recent": deque((_entry_view(e.to_dict()) for e in recent_rows), maxlen=RECENT_ENTRIES),
+        "summary": deque((text[:SUMMARY_TOPIC_CHARS] for (text,) in older_questions), maxlen=SUMMARY_TOPICS),
+    }
+
+
+def _history_state(chat_id: int) -> dict:
+    with _lock:
+        state = CHAT_CONTEXT_CACHE.get(chat_id)
+    if state is None:
+        state = _load_state(chat_id)
+        with _lock:
+            CHAT_CONTEXT_CACHE[chat_id] = state
+        return state
+
+    # Einträge, die an diesem Prozess vorbei gespeichert wurden (andere Worker), nachziehen
+    missing = (
+        ChatEntry.query.filter(ChatEntry.chat_id == chat_id, ChatEntry.id > state["last_entry_id"])
+        .order_by(ChatEntry.datetime, ChatEntry.id)
+        .all()
+    )
+    if missing:
+        with _lock:
+            for entry in missing:
+                if entry.id > state["last_entry_id"]:
+                    _fold(state, entry.to_dict())
+    return state
+
+
+def record_entry(entry: dict):
+    """Schreibt den gecachten Kontext eines Chats nach einem neuen Eintrag fort."""
+    with _lock:
+        state = CHAT_CONTEXT_CACHE.get(entry["chat_id"])
+        if state is not None and entry["id"] > state["last_entry_id"]:
+            _fold(state, entry)
+
+
+def invalidate(chat_id: int):
+    with _lock:
+        CHAT_CONTEXT_CACHE.pop(chat_id, None)
+
+
+def _stock_context(aktie_id: int) -> dict:
+    from .market import get_company_info_cached, resolve_ticker
+
+    aktie = db.session.get(Aktie, aktie_id)
+    if aktie is None:
+        return {"symbol": "dieser Aktie", "display_name": "dieser Aktie", "company": {}}
+
+    ticker = resolve_ticker(aktie.isin)
+    try:
+        info = get_company_info_cached(ticker) if ticker else {}
+    except Exception:
+        info = {}
+
+    return {
+        "symbol": info.get("symbol") or ticker or aktie.isin,
+        "display_name": info.get("longName") or info.get("shortName") or aktie.name,
+        "company": {
+            "name": aktie.name,
+            "isin": aktie.isin,
+            "sector": info.get("sector") or aktie.kategorie,
+            "industry": info.get("industry"),
+            "country": info.get("country") or aktie.land,
+            "currency": info.get("currency") or aktie.currency,
+            "price": info.get("regularMarketPrice") or info.get("currentPrice"),
+        },
+    }
+
+
+def _portfolio_context(portfolio_id: int) -> dict:
+    portfolio = db.session.get(Portfolio, portfolio_id)
+    name = portfolio.name if portfolio is not None else str(portfolio_id)
+
+    label = f"Portfolio '{name}'"
+    return {
+        "symbol": label,
+        "display_name": label,
+        "positions": [
+            {"name": aktie.name, "isin": aktie.isin, "menge": float(position.menge)}
+            for position, aktie in open_positions(portfolio_id)
+        ],
+    }
+
+
+def build_chat_context(chat) -> dict:
+    """
+    Prompt-Kontext für einen gespeicherten Chat (Chatverlauf).
+    Enthält immer symbol, display_name, history, summary und entry_count.
+    """
+    if chat.type == ChatTypeEnum.AKTIE:
+        context = _stock_context(chat.foreign_id)
+    else:
+        context = _portfolio_context(chat.foreign_id)
+
+    state = _history_state(chat.id)
+    with _lock:
+        context.update({
+            "history": list(state["recent"]),
+            "summary": list(state["summary"]),
+            "entry_count": state["entry_count"],
+        })
+    return context
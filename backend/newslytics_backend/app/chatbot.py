@@ -0,0 +1,123 @@
+"""
+Chatbot-Logik für /chatbot/stock.
+
+Die Antwort kommt von einem austauschbaren Generator-Backend, das Tokens
+einzeln liefert (stream()). Dadurch kann die Route die Antwort entweder als
+Ganzes oder als SSE-Stream ausliefern.
+
+Backends werden über Config.CHATBOT_BACKEND gewählt: ein Name aus
+GENERATOR_BACKENDS oder ein Importpfad "paket.modul:Klasse". Ein Backend wird
+mit der App-Config instanziert und braucht nur eine Methode
+stream(message, context) -> Iterator[str].
+"""
+import importlib
+import re
+import time
+from datetime import datetime
+
+from flask import Response, current_app, stream_with_context
+
+from .chat_context import record_entry
+from .events import broker, format_sse
+from .models import db, ChatEntry, SenderEnum
+
+
+def build_stock_context(stock_payload: dict, history: list) -> dict:
+    symbol = (
+        stock_payload.get("symbol")
+        or stock_payload.get("ticker")
+        or stock_payload.get("isin")
+        or "dieser Aktie"
+    )
+    display_name = (
+        stock_payload.get("name")
+        or stock_payload.get("shortName")
+        or stock_payload.get("longName")
+        or symbol
+    )
+    return {
+        "symbol": symbol,
+        "display_name": display_name,
+        "history": history,
+    }
+
+
+class FakeGenerator:
+    """
+    Deterministischer lokaler Stand-in für ein Sprachmodell (Tests, Benchmarks).
+    Liefert die bisherige Dummy-Antwort wortweise; optional mit künstlicher
+    Verzögerung pro Token (CHATBOT_FAKE_TOKEN_DELAY).
+    """
+
+    def __init__(self, config):
+        self.token_delay = config.get("CHATBOT_FAKE_TOKEN_DELAY", 0.0)
+
+    def stream(self, message: str, context: dict):
+        # Dummy response that references latest user input and current stock context
+        symbol = context["symbol"]
+        display_name = context["display_name"]
+        has_history = context["history"] or context.get("summary")
+        summary_hint = " Ich berücksichtige den bisherigen Verlauf." if has_history else ""
+        stock_descriptor = f"{display_name} ({symbol})" if display_name != symbol else display_name
+        reply = (
+            f"Zu {stock_descriptor}: Ich kann dir einen allgemeinen Hinweis geben. "
+            f"Deine Frage war: '{message}'.{summary_hint}"
+        )
+
+        for token in re.findall(r"\S+\s*", reply):
+            if self.token_delay:
+                time.sleep(self.token_delay)
+            yield token
+
+
+GENERATOR_BACKENDS = {
+    "fake": FakeGenerator,
+}
+
+
+def get_generator():
+    backend = current_app.config["CHATBOT_BACKEND"]
+    generator_cls = GENERATOR_BACKENDS.get(backend)
+    if generator_cls is None:
+        module_name, _, class_name = backend.partition(":")
+        generator_cls = getattr(importlib.import_module(module_name), class_name)
+    return generator_cls(current_app.config)
+
+
+def persist_message(chat_id: int, text: str, sender: SenderEnum = SenderEnum.USER) -> dict:
+    """Speichert eine Chat-Nachricht, schreibt den Kontext-Cache fort und pusht sie an SSE-Abonnenten."""
+    entry = ChatEntry(chat_id=chat_id, sender=sender, text=text)
+    db.session.add(entry)
+    db.session.commit()
+    entry_dict = entry.to_dict()
+    record_entry(entry_dict)
+    broker.publish(f"chat:{chat_id}", "chat_entry", entry_dict)
+    return entry_dict
+
+
+def stream_reply_response(tokens, chat_id=None) -> Response:
+    """
+    SSE-Antwort: ein "token"-Event pro Token, danach ein "done"-Event mit dem
+    kompletten Text. Gespeichert wird erst, wenn der Stream vollständig ist.
+    """
+
+    @stream_with_context
+    def generate():
+        parts = []
+        for token in tokens:
+            parts.append(token)
+            yield format_sse("token", {"text": token})
+
+        reply = "".join(parts)
+        entry = persist_message(chat_id, reply, SenderEnum.AI) if chat_id is not None else None
+        yield format_sse("done", {
+            "reply": reply,
+            "timestamp": datetime.utcnow().isoformat() + "Z",
+            "entry": entry,
+        })
+
+    return Response(
+        generate(),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
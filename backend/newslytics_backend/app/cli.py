@@ -0,0 +1,301 @@
+"""
+Flask-CLI-Kommandos für Betrieb und Performance-Checks.
+"""
+import json
+import os
+import subprocess
+import sys
+import time
+
+import click
+
+# Module, die beim reinen App-Import NICHT geladen werden dürfen
+HEAVY_MODULES = ("yfinance", "pandas", "numpy")
+
+
+def _parse_importtime(stderr: str):
+    """
+    Parst die Ausgabe von `python -X importtime`.
+    Liefert eine Liste von Dicts (module, self_us, cumulative_us).
+    """
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3:
+            continue
+        self_us, cumulative_us, name = parts
+        stripped = name.lstrip()
+        rows.append({
+            "module": stripped.rstrip(),
+            "self_us": int(self_us.strip()),
+            "cumulative_us": int(cumulative_us.strip()),
+        })
+    return rows
+
+
+def register_cli(app):
+
+    @app.cli.command("importtime")
+    @click.option("--top", default=15, show_default=True, help="Anzahl der teuersten Pakete im Report.")
+    @click.option("--max-ms", type=float, default=None, help="Fehler, wenn der App-Import länger dauert.")
+    @click.option("--json-out", type=click.Path(dir_okay=False), default=None, help="Report zusätzlich als JSON speichern.")
+    def importtime(top, max_ms, json_out):
+        """Misst die Import-Zeit der App (python -X importtime) als Startup-Report."""
+        backend_dir = os.path.dirname(app.root_path)
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", "import app.routes, app.market, app.cli"],
+            cwd=backend_dir,
+            capture_output=True,
+            text=True,
+        )
+        if proc.returncode != 0:
+            raise click.ClickException(f"Import fehlgeschlagen:\n{proc.stderr[-2000:]}")
+
+        rows = _parse_importtime(proc.stderr)
+
+        # Zeit pro Top-Level-Paket aufsummieren (self-Zeiten aller Submodule)
+        per_package = {}
+        for row in rows:
+            package = row["module"].split(".")[0]
+            per_package[package] = per_package.get(package, 0) + row["self_us"]
+
+        total_us = sum(per_package.values())
+        heavy_loaded = sorted({r["module"].split(".")[0] for r in rows} & set(HEAVY_MODULES))
+
+        click.echo(f"App-Import gesamt: {total_us / 1000:.1f} ms ({len(rows)} Module)")
+        click.echo(f"{'Paket':<30} {'ms':>10}")
+        for package, us in sorted(per_package.items(), key=lambda kv: kv[1], reverse=True)[:top]:
+            click.echo(f"{package:<30} {us / 1000:>10.1f}")
+
+        if json_out:
+            with open(json_out, "w") as fh:
+                json.dump({
+                    "total_ms": round(total_us / 1000, 1),
+                    "packages_ms": {k: round(v / 1000, 1) for k, v in per_package.items()},
+                    "heavy_loaded": heavy_loaded,
+                }, fh, indent=2, sort_keys=True)
+
+        if heavy_loaded:
+            raise click.ClickException(
+                f"Schwere Module beim App-Import geladen: {', '.join(heavy_loaded)}"
+            )
+        if max_ms is not None and total_us / 1000 > max_ms:
+            raise click.ClickException(
+                f"App-Import dauert {total_us / 1000:.1f} ms (Budget: {max_ms:.1f} ms)"
+            )
+
+    @app.cli.command("bench-chatbot")
+    @click.option("--requests", "n_requests", default=200, show_default=True, help="Anzahl Chatbot-Anfragen.")
+    @click.option("--token-delay", type=float, default=None, help="Künstliche Verzögerung pro Token (Fake-Backend).")
+    def bench_chatbot(n_requests, token_delay):
+        """Benchmark für /chatbot/stock (Streaming) mit dem deterministischen Fake-Backend."""
+        app.config["CHATBOT_BACKEND"] = "fake"
+        if token_delay is not None:
+            app.config["CHATBOT_FAKE_TOKEN_DELAY"] = token_delay
+
+        client = app.test_client()
+        payload = {
+            "message": "Wie sieht die Dividende aus?",
+            "stock": {"symbol": "AAPL", "name": "Apple Inc."},
+            "stream": True,
+        }
+
+        first_token_ms = []
+        total_ms = []
+        tokens = 0
+        for _ in range(n_requests):
+            started = time.perf_counter()
+            response = client.post("/api/chatbot/stock", json=payload, buffered=False)
+            first = None
+            for chunk in response.response:
+                if first is None and b"event: token" in chunk:
+                    first = time.perf_counter()
+                tokens += chunk.count(b"event: token")
+            response.close()
+            ended = time.perf_counter()
+            first_token_ms.append(((first or ended) - started) * 1000)
+            total_ms.append((ended - started) * 1000)
+
+        first_token_ms.sort()
+        total_ms.sort()
+        elapsed_s = sum(total_ms) / 1000
+        click.echo(f"Requests:            {n_requests}")
+        click.echo(f"Tokens/s:            {tokens / elapsed_s:.0f}")
+        click.echo(f"Time-to-first-token: p50 {first_token_ms[len(first_token_ms) // 2]:.2f} ms")
+        click.echo(f"Komplette Antwort:   p50 {total_ms[len(total_ms) // 2]:.2f} ms, "
+                   f"p95 {total_ms[int(len(total_ms) * 0.95)]:.2f} ms")
+
+    @app.cli.command("bench-login")
+    @click.option("--seconds", default=5.0, show_default=True, help="Dauer des Benchmarks.")
+    @click.option("--threads", default=None, type=int, help="Parallele Request-Threads (Default: Pool-Größe).")
+    def bench_login(seconds, threads):
+        """Login-Durchsatz (Passwortprüfungen/s) mit PASSWORD_HASH_METHOD und -WORKERS."""
+        from concurrent.futures import ThreadPoolExecutor
+
+        from .security import hash_password, verify_password
+
+        workers = app.config["PASSWORD_HASH_WORKERS"]
+        threads = threads or max(workers, 1)
+
+        with app.app_context():
+            password_hash = hash_password("benchmark-password")
+
+        def worker():
+            done = 0
+            deadline = time.perf_counter() + seconds
+            with app.app_context():
+                while time.perf_counter() < deadline:
+                    verify_password(password_hash, "benchmark-password")
+                    done += 1
+            return done
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            total = sum(pool.map(lambda _: worker(), range(threads)))
+        elapsed = time.perf_counter() - started
+
+        cores = min(max(workers, 1), os.cpu_count() or 1)
+        click.echo(f"Methode:        {app.config['PASSWORD_HASH_METHOD']}")
+        click.echo(f"Hash-Worker:    {workers} (Threads: {threads})")
+        click.echo(f"Logins/s:       {total / elapsed:.1f}")
+        click.echo(f"Logins/s/Kern:  {total / elapsed / cores:.1f}")
+
+    @app.cli.command("rebuild-positions")
+    @click.option("--portfolio", "portfolio_id", type=int, default=None, help="Nur dieses Portfolio abgleichen.")
+    @click.option("--check", is_flag=True, help="Nur prüfen, nichts ändern (Exit-Code 1 bei Abweichungen).")
+    def rebuild_positions_command(portfolio_id, check):
+        """Gleicht die Positions-Tabelle mit den Transaktionen ab bzw. baut sie neu auf."""
+        from .positions import rebuild_positions
+
+        report = rebuild_positions(portfolio_id, dry_run=check)
+        for kind in ("missing", "stale", "orphaned"):
+            click.echo(f"{kind:<10} {len(report[kind])}")
+            for pid, aid in report[kind][:20]:
+                click.echo(f"  Portfolio {pid}, Aktie {aid}")
+
+        if check and any(report.values()):
+            raise click.ClickException("Positionen weichen von den Transaktionen ab")
+
+    @app.cli.command("upstream-drill")
+    @click.option("--requests", "n_requests", default=40, show_default=True, help="Anfragen pro Phase.")
+    @click.option("--error-rate", default=0.8, show_default=True, help="Fehlerquote des Fakes in der Störungsphase.")
+    @click.option("--latency", default=0.02, show_default=True, help="Latenz pro Fake-Upstream-Request (s).")
+    @click.option("--open-seconds", default=1.0, show_default=True, help="Offen-Dauer des Circuit-Breakers.")
+    def upstream_drill(n_requests, error_rate, latency, open_seconds):
+        """Störungsübung gegen den lokalen Fake-Upstream: normal -> Ausfall -> Erholung."""
+        from datetime import datetime
+
+        from . import market
+
+        app.config.update(
+            MARKETDATA_BACKEND="fake",
+            UPSTREAM_FAKE_ERROR_RATE=0.0,
+            UPSTREAM_FAKE_LATENCY=latency,
+            UPSTREAM_BREAKER_OPEN_SECONDS=open_seconds,
+            UPSTREAM_MAX_WAIT_SECONDS=0.5,
+        )
+        market.configure(app.config)
+        market.COMPANYINFO_CACHE.clear()
+        fake = market.get_yf()
+        client = app.test_client()
+
+        def run_phase(label, symbols):
+            statuses = {}
+            latencies = []
+            for symbol in symbols:
+                started = time.perf_counter()
+                status = client.get(f"/api/companyinfo?symbol={symbol}").status_code
+                latencies.append((time.perf_counter() - started) * 1000)
+                statuses[status] = statuses.get(status, 0) + 1
+            latencies.sort()
+            breaker = market.UPSTREAM.metrics()["breaker"]
+            click.echo(
+                f"{label:<10} Status {dict(sorted(statuses.items()))}  "
+                f"p50 {latencies[len(latencies) // 2]:.1f} ms  p95 {latencies[int(len(latencies) * 0.95)]:.1f} ms  "
+                f"Breaker {breaker['state']} (Fehlerquote {breaker['error_rate']:.0%})"
+            )
+
+        def run_quote_phase(label, symbols, batch_size=5):
+            requested = served = 0
+            for i in range(0, len(symbols), batch_size):
+                batch = symbols[i:i + batch_size]
+                # TTL 0: jeder Aufruf geht zum Upstream, abgelaufene Quotes bleiben als Fallback
+                served += len(market.get_quotes_cached(batch, ttl_seconds=0))
+                requested += len(batch)
+            breaker = market.UPSTREAM.metrics()["breaker"]
+            click.echo(
+                f"{label:<10} Quotes {served}/{requested} geliefert  "
+                f"Breaker {breaker['state']} (Fehlerquote {breaker['error_rate']:.0%})"
+            )
+
+        click.echo("Company-Info (/api/companyinfo):")
+        known = [f"DRILL{i}" for i in range(n_requests // 2)]
+        run_phase("normal", known + [f"WARM{i}" for i in range(n_requests - len(known))])
+
+        # Ausfall: bekannte Symbole sind abgelaufen (-> stale), neue haben keinen Cache
+        for entry in market.COMPANYINFO_CACHE.values():
+            entry["expires_at"] = datetime.utcnow()
+        fake.error_rate = error_rate
+        run_phase("ausfall", [s for pair in zip(known, (f"NEW{i}" for i in range(len(known)))) for s in pair])
+
+        fake.error_rate = 0.0
+        time.sleep(open_seconds)
+        run_phase("erholung", [f"BACK{i}" for i in range(n_requests)])
+        click.echo(json.dumps(market.UPSTREAM.metrics()["operations"], indent=2, sort_keys=True))
+
+        # Batch-Quotes: yf.download wirft bei Ausfällen nicht, die Symbole fehlen nur.
+        # Rate-Limit hoch, damit nur der Circuit-Breaker wirkt (ein Batch kostet 5 Tokens)
+        app.config.update(UPSTREAM_FAKE_ERROR_RATE=0.0, UPSTREAM_RATE_PER_SECOND=1000, UPSTREAM_BURST=100)
+        market.configure(app.config)
+        market.QUOTE_CACHE.clear()
+        fake = market.get_yf()
+
+        click.echo("Batch-Quotes (yf.download):")
+        known = [f"QDRILL{i}" for i in range(n_requests // 2)]
+        run_quote_phase("normal", known)
+
+        fake.error_rate = error_rate
+        run_quote_phase("ausfall", [s for pair in zip(known, (f"QNEW{i}" for i in range(len(known)))) for s in pair])
+
+        fake.error_rate = 0.0
+        time.sleep(open_seconds)
+        run_quote_phase("erholung", [f"QBACK{i}" for i in range(n_requests)])
+        click.echo(json.dumps(market.UPSTREAM.metrics()["operations"], indent=2, sort_keys=True))
+
+    @app.cli.command("archive-chats")
+    @click.option("--days", type=int, default=None, help="Einträge älter als N Tage archivieren (Default: CHAT_ARCHIVE_AFTER_DAYS).")
+    @click.option("--batch-size", default=5000, show_default=True, help="Einträge pro Batch/Commit.")
+    def archive_chats(days, batch_size):
+        """Verschiebt alte Chat-Einträge von chat_entries nach chat_entries_archive."""
+        from datetime import datetime, timedelta
+
+        from .archive import archive_chat_entries
+
+        days = app.config["CHAT_ARCHIVE_AFTER_DAYS"] if days is None else days
+        cutoff = datetime.utcnow() - timedelta(days=days)
+
+        started = time.perf_counter()
+        moved, chat_ids = archive_chat_entries(cutoff, batch_size)
+        click.echo(
+            f"{moved} Einträge aus {len(chat_ids)} Chats archiviert "
+            f"(älter als {cutoff:%Y-%m-%d %H:%M}, {time.perf_counter() - started:.1f} s)"
+        )
+
+    @app.cli.command("prefetch")
+    @click.option("--once", is_flag=True, help="Jeden Job einmal ausführen und beenden.")
+    @click.option("--jobs", default="trending,quotes,histories", show_default=True, help="Auszuführende Jobs.")
+    def prefetch(once, jobs):
+        """Prefetch-Worker: hält Trending, Quotes und Kurshistorien im geteilten Store aktuell."""
+        import logging
+
+        from .prefetch import PrefetchWorker
+
+        job_names = [j.strip() for j in jobs.split(",") if j.strip()]
+        unknown = set(job_names) - {"trending", "quotes", "histories"}
+        if unknown:
+            raise click.ClickException(f"Unbekannte Jobs: {', '.join(sorted(unknown))}")
+
+        app.logger.setLevel(logging.INFO)
+        PrefetchWorker(app, job_names).run(once=once)
@@ -1,5 +1,4 @@
 import os
-import os
 from datetime import timedelta
 
 class Config:
@@ -8,8 +7,55 @@ class Config:
         "postgresql://postgres:postgres@db:5432/postgres",
     )
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Tabellen/Indizes beim Start anlegen; nur ein Service pro DB sollte das tun
+    # (der Prefetch-Worker setzt CREATE_SCHEMA=0, sonst konkurrieren beide um CREATE TABLE)
+    CREATE_SCHEMA = os.getenv("CREATE_SCHEMA", "1") == "1"
     SECRET_KEY = os.getenv("SECRET_KEY", "dev-secret-key")
 
     # JWT-Konfiguration
     JWT_SECRET_KEY = os.getenv("JWT_SECRET_KEY", "dev-jwt-secret-key")
-    JWT_ACCESS_TOKEN_EXPIRES = timedelta(hours=1)
\ No newline at end of file
+    JWT_ACCESS_TOKEN_EXPIRES = timedelta(hours=1)
+    # Cache für User + Portfolio-IDs des eingeloggten Users (Sekunden)
+    AUTH_CACHE_TTL_SECONDS = int(os.getenv("AUTH_CACHE_TTL_SECONDS", "60"))
+
+    # Passwort-Hashing (werkzeug-Format, z.B. "scrypt:32768:8:1" oder "pbkdf2:sha256:600000")
+    PASSWORD_HASH_METHOD = os.getenv("PASSWORD_HASH_METHOD", "scrypt:32768:8:1")
+    # Größe des Prozess-Pools fürs Hashing; 0 = im Request-Thread hashen
+    PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+
+    # Market-Data: yfinance/pandas schon beim Start laden statt beim ersten Request
+    PRELOAD_MARKETDATA = os.getenv("PRELOAD_MARKETDATA", "0") == "1"
+    # Upstream-Backend: "yahoo" oder "fake" (lokaler Fake mit Fehler-/Latenz-Injektion)
+    MARKETDATA_BACKEND = os.getenv("MARKETDATA_BACKEND", "yahoo")
+    UPSTREAM_FAKE_ERROR_RATE = float(os.getenv("UPSTREAM_FAKE_ERROR_RATE", "0"))
+    UPSTREAM_FAKE_LATENCY = float(os.getenv("UPSTREAM_FAKE_LATENCY", "0"))
+    # Upstream-Schutz: Timeout, Token-Bucket (Aufrufe/s, Burst, max. Wartezeit), Circuit-Breaker
+    UPSTREAM_TIMEOUT_SECONDS = float(os.getenv("UPSTREAM_TIMEOUT_SECONDS", "5"))
+    UPSTREAM_RATE_PER_SECOND = float(os.getenv("UPSTREAM_RATE_PER_SECOND", "5"))
+    UPSTREAM_BURST = int(os.getenv("UPSTREAM_BURST", "10"))
+    UPSTREAM_MAX_WAIT_SECONDS = float(os.getenv("UPSTREAM_MAX_WAIT_SECONDS", "2"))
+    UPSTREAM_BREAKER_WINDOW = int(os.getenv("UPSTREAM_BREAKER_WINDOW", "20"))
+    UPSTREAM_BREAKER_MIN_CALLS = int(os.getenv("UPSTREAM_BREAKER_MIN_CALLS", "10"))
+    UPSTREAM_BREAKER_ERROR_RATE = float(os.getenv("UPSTREAM_BREAKER_ERROR_RATE", "0.5"))
+    UPSTREAM_BREAKER_OPEN_SECONDS = float(os.getenv("UPSTREAM_BREAKER_OPEN_SECONDS", "30"))
+
+    # Prefetch-Worker (`flask prefetch`): Intervalle in Sekunden
+    PREFETCH_TRENDING_REGIONS = os.getenv("PREFETCH_TRENDING_REGIONS", "US,DE")
+    PREFETCH_TRENDING_INTERVAL = int(os.getenv("PREFETCH_TRENDING_INTERVAL", "300"))
+    PREFETCH_QUOTES_INTERVAL = int(os.getenv("PREFETCH_QUOTES_INTERVAL", "15"))
+    PREFETCH_HISTORY_INTERVAL = int(os.getenv("PREFETCH_HISTORY_INTERVAL", "300"))
+
+    # Antwort-Kompression (gzip/brotli) ab dieser Größe in Bytes
+    COMPRESS_MIN_SIZE = int(os.getenv("COMPRESS_MIN_SIZE", "1024"))
+    COMPRESS_LEVEL = int(os.getenv("COMPRESS_LEVEL", "6"))
+
+    # Server-Sent Events (/api/stream)
+    STREAM_QUOTE_INTERVAL = int(os.getenv("STREAM_QUOTE_INTERVAL", "15"))
+    STREAM_KEEPALIVE_SECONDS = int(os.getenv("STREAM_KEEPALIVE_SECONDS", "20"))
+
+    # Chatbot: Generator-Backend ("fake" oder "paket.modul:Klasse")
+    CHATBOT_BACKEND = os.getenv("CHATBOT_BACKEND", "fake")
+    CHATBOT_FAKE_TOKEN_DELAY = float(os.getenv("CHATBOT_FAKE_TOKEN_DELAY", "0"))
+
+    # Chat-Einträge, die älter sind, verschiebt `flask archive-chats` ins Archiv
+    CHAT_ARCHIVE_AFTER_DAYS = int(os.getenv("CHAT_ARCHIVE_AFTER_DAYS", "90"))
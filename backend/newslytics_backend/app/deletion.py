@@ -0,0 +1,70 @@
+"""
+Löschen von Usern, Portfolios und Chats per Bulk-SQL.
+
+Statt über die ORM-Cascades jede Transaktion, Position und jeden
+Chat-Eintrag als Objekt zu laden und einzeln zu löschen, wird pro Tabelle
+genau ein DELETE abgesetzt (Kinder vor Eltern). Das funktioniert auch auf
+Bestands-DBs, deren Fremdschlüssel noch ohne ON DELETE CASCADE angelegt sind.
+
+Die Funktionen committen nicht; sie liefern die IDs der gelöschten Chats,
+damit der Aufrufer nach dem Commit die Chat-Kontext-Caches leeren kann.
+"""
+from sqlalchemy import and_, or_
+
+from .models import (
+    db,
+    ChatEntry,
+    ChatEntryArchive,
+    ChatTypeEnum,
+    Chatverlauf,
+    Portfolio,
+    Position,
+    Transaktion,
+    User,
+    Watchlist,
+)
+
+
+def _bulk_delete(model, *criteria):
+    db.session.query(model).filter(*criteria).delete(synchronize_session=False)
+
+
+def _delete_chats(*criteria):
+    chat_ids = [chat_id for (chat_id,) in db.session.query(Chatverlauf.id).filter(*criteria)]
+    if chat_ids:
+        _bulk_delete(ChatEntry, ChatEntry.chat_id.in_(chat_ids))
+        _bulk_delete(ChatEntryArchive, ChatEntryArchive.chat_id.in_(chat_ids))
+        _bulk_delete(Chatverlauf, Chatverlauf.id.in_(chat_ids))
+    return chat_ids
+
+
+def _portfolio_chats(portfolio_ids):
+    return and_(Chatverlauf.type == ChatTypeEnum.PORTFOLIO, Chatverlauf.foreign_id.in_(portfolio_ids))
+
+
+def _delete_portfolios(portfolio_ids):
+    _bulk_delete(Transaktion, Transaktion.portfolio_id.in_(portfolio_ids))
+    _bulk_delete(Position, Position.portfolio_id.in_(portfolio_ids))
+    _bulk_delete(Portfolio, Portfolio.id.in_(portfolio_ids))
+
+
+def delete_chat(chat_id: int):
+    return _delete_chats(Chatverlauf.id == chat_id)
+
+
+def delete_portfolio(portfolio_id: int):
+    """Portfolio inkl. Transaktionen, Positionen und der Chats zu diesem Portfolio."""
+    chat_ids = _delete_chats(_portfolio_chats([portfolio_id]))
+    _delete_portfolios([portfolio_id])
+    return chat_ids
+
+
+def delete_user(user_id: int):
+    """User inkl. Portfolios (s.o.), Watchlist und aller eigenen Chats."""
+    portfolio_ids = [pid for (pid,) in db.session.query(Portfolio.id).filter_by(user_id=user_id)]
+    chat_ids = _delete_chats(or_(Chatverlauf.user_id == user_id, _portfolio_chats(portfolio_ids)))
+    if portfolio_ids:
+        _delete_portfolios(portfolio_ids)
+    _bulk_delete(Watchlist, Watchlist.user_id == user_id)
+    _bulk_delete(User, User.id == user_id)
+    return chat_ids
@@ -0,0 +1,81 @@
+"""
+In-Process Publish/Subscribe für Server-Sent Events.
+
+Topics:
+- "chat:<chat_id>"  -> neue ChatEntry-Zeilen
+- "quote:<SYMBOL>"  -> aktualisierte Kurse aus dem Quote-Cache
+
+Jeder Subscriber bekommt eine eigene Queue; publish() verteilt ein Event an
+alle Queues des Topics. Der Broker lebt pro Worker-Prozess.
+"""
+import json
+import queue
+import threading
+from collections import defaultdict
+
+
+class Subscription:
+    def __init__(self, topics, maxsize: int = 100):
+        self.topics = set(topics)
+        self.queue = queue.Queue(maxsize=maxsize)
+
+    def get(self, timeout: float):
+        """Nächstes Event oder None nach timeout Sekunden."""
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class EventBroker:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = defaultdict(set)  # topic -> {Subscription}
+
+    def subscribe(self, topics) -> Subscription:
+        sub = Subscription(topics)
+        with self._lock:
+            for topic in sub.topics:
+                self._subscribers[topic].add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscription):
+        with self._lock:
+            for topic in sub.topics:
+                subs = self._subscribers.get(topic)
+                if subs is None:
+                    continue
+                subs.discard(sub)
+                if not subs:
+                    del self._subscribers[topic]
+
+    def has_subscribers(self, topic: str) -> bool:
+        with self._lock:
+            return topic in self._subscribers
+
+    def topics(self, prefix: str = ""):
+        with self._lock:
+            return [t for t in self._subscribers if t.startswith(prefix)]
+
+    def publish(self, topic: str, event: str, data):
+        with self._lock:
+            subs = list(self._subscribers.get(topic, ()))
+        if not subs:
+            return 0
+
+        message = format_sse(event, data)
+        for sub in subs:
+            try:
+                sub.queue.put_nowait(message)
+            except queue.Full:
+                # Langsamer Client: Event verwerfen statt den Publisher zu blockieren
+                pass
+        return len(subs)
+
+
+def format_sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+broker = EventBroker()
@@ -0,0 +1,144 @@
+"""
+Lokaler Fake für Yahoo Finance (MARKETDATA_BACKEND=fake).
+
+Bildet die von market.py genutzte yfinance-Oberfläche nach (Ticker.info,
+Ticker.history, download, Search, utils.get_ticker_by_isin) plus die
+Trending-Liste, mit deterministischen Kursen und ohne Netzwerk. download()
+verhält sich wie yfinance und meldet Fehler einzelner Symbole nur als leere
+Spalten.
+Fehler und Latenz lassen sich injizieren (UPSTREAM_FAKE_ERROR_RATE,
+UPSTREAM_FAKE_LATENCY, auch zur Laufzeit änderbar), um Rate-Limiter und
+Circuit-Breaker lokal zu testen (`flask upstream-drill`).
+"""
+import random
+import threading
+import time
+import zlib
+
+_PERIOD_DAYS = {
+    "1d": 1, "5d": 5, "1mo": 21, "3mo": 63, "6mo": 126,
+    "1y": 252, "2y": 504, "5y": 1260, "10y": 2520, "ytd": 200, "max": 2520,
+}
+
+_COLUMNS = ["Open", "High", "Low", "Close", "Volume"]
+
+
+class FakeUpstreamError(Exception):
+    """Injizierter Upstream-Fehler (entspricht z.B. HTTP 429/5xx von Yahoo)."""
+
+
+class FakeYahoo:
+    def __init__(self, error_rate: float = 0.0, latency: float = 0.0, seed: int = 0):
+        self.error_rate = error_rate
+        self.latency = latency
+        self.requests = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.utils = _FakeUtils(self)
+
+    def _request(self):
+        """Simuliert einen HTTP-Roundtrip: Latenz + ggf. Fehler."""
+        with self._lock:
+            self.requests += 1
+            failed = self._random.random() < self.error_rate
+        if self.latency:
+            time.sleep(self.latency)
+        if failed:
+            raise FakeUpstreamError("Injected upstream error (429 Too Many Requests)")
+
+    # ------- yfinance-Oberfläche -------
+
+    def Ticker(self, symbol: str):
+        return _FakeTicker(self, symbol)
+
+    def Search(self, query: str, max_results: int = 10, **_kwargs):
+        self._request()
+        return _FakeSearch([
+            {"symbol": f"{query.upper()[:4]}{i}", "shortname": f"{query} {i}", "quoteType": "EQUITY"}
+            for i in range(min(max_results, 5))
+        ])
+
+    def download(self, symbols, period="1mo", interval="1d", group_by="ticker", **_kwargs):
+        """
+        Wie yfinance: Fehler einzelner Symbole werden nicht geworfen, sondern
+        ergeben leere (NaN-)Spalten für diese Symbole.
+        """
+        import pandas as pd
+
+        symbols = [symbols] if isinstance(symbols, str) else list(symbols)
+        frames = {}
+        for symbol in symbols:
+            try:
+                self._request()
+                frames[symbol] = _frame(symbol, period)
+            except FakeUpstreamError:
+                frames[symbol] = pd.DataFrame(columns=_COLUMNS, dtype=float)
+        return pd.concat(frames, axis=1)
+
+    def fetch_trending(self, region: str) -> dict:
+        self._request()
+        return {"finance": {"result": [{"quotes": [{"symbol": f"TRND{i}.{region}"} for i in range(10)]}]}}
+
+
+class _FakeUtils:
+    def __init__(self, upstream: FakeYahoo):
+        self._upstream = upstream
+
+    def get_ticker_by_isin(self, isin: str):
+        self._upstream._request()
+        return f"T{isin[2:6]}"
+
+
+class _FakeSearch:
+    def __init__(self, quotes):
+        self.quotes = quotes
+
+
+class _FakeTicker:
+    def __init__(self, upstream: FakeYahoo, symbol: str):
+        self._upstream = upstream
+        self.symbol = symbol
+
+    @property
+    def info(self) -> dict:
+        self._upstream._request()
+        price = 50 + zlib.crc32(self.symbol.encode()) % 400
+        return {
+            "symbol": self.symbol,
+            "shortName": f"{self.symbol} Corp.",
+            "longName": f"{self.symbol} Corporation",
+            "exchange": "FAKE",
+            "currency": "USD",
+            "sector": "Technology",
+            "industry": "Software",
+            "quoteType": "EQUITY",
+            "regularMarketPrice": float(price),
+            "regularMarketChangePercent": 0.0,
+            "isin": f"US{zlib.crc32(self.symbol.encode()):010d}",
+        }
+
+    def history(self, period="1mo", interval="1d", **_kwargs):
+        self._upstream._request()
+        return _frame(self.symbol, period)
+
+
+def _frame(symbol: str, period: str):
+    """
+    Deterministischer Random-Walk (Tages-Bars) pro Symbol. Kürzere Zeiträume
+    sind das Ende derselben Reihe, überlappende Abrufe passen also zusammen.
+    """
+    import numpy as np
+    import pandas as pd
+
+    total = max(_PERIOD_DAYS.values())
+    rng = np.random.default_rng(zlib.crc32(symbol.encode()))
+    index = pd.bdate_range(end=pd.Timestamp.now(tz="America/New_York").normalize(), periods=total)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, total)))
+    frame = pd.DataFrame({
+        "Open": close * 0.995,
+        "High": close * 1.01,
+        "Low": close * 0.99,
+        "Close": close,
+        "Volume": rng.integers(1_000, 100_000, total).astype(float),
+    }, index=index)
+    return frame.iloc[-_PERIOD_DAYS.get(period, 21):]
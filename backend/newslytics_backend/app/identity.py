@@ -0,0 +1,69 @@
+"""
+Cache für den eingeloggten User bei JWT-geschützten Routen.
+
+Beim Validieren des Tokens (user_lookup_loader von flask_jwt_extended) wird
+der User samt den IDs seiner Portfolios geladen und
+- prozessweit für AUTH_CACHE_TTL_SECONDS gecacht
+- pro Request von flask_jwt_extended als `current_user` bereitgehalten.
+
+Ownership-Checks (`portfolio_id in current_user.portfolio_ids`) brauchen
+damit keine zusätzlichen Queries. Anlegen/Löschen von Portfolios und Usern
+invalidiert den Eintrag; andere Worker sehen Änderungen spätestens nach
+Ablauf der TTL.
+"""
+import threading
+from datetime import datetime, timedelta
+
+from flask import current_app
+
+from .models import db, Portfolio, User
+
+IDENTITY_CACHE = {}  # Key: user_id -> {"expires_at": datetime, "identity": Identity}
+_lock = threading.Lock()
+
+
+class Identity:
+    __slots__ = ("user_id", "user", "portfolio_ids")
+
+    def __init__(self, user_id: int, user: dict, portfolio_ids):
+        self.user_id = user_id
+        self.user = user
+        self.portfolio_ids = frozenset(portfolio_ids)
+
+    def owns_portfolio(self, portfolio_id) -> bool:
+        return portfolio_id in self.portfolio_ids
+
+
+def load_identity(user_id: int):
+    now = datetime.utcnow()
+    with _lock:
+        entry = IDENTITY_CACHE.get(user_id)
+    if entry and entry["expires_at"] > now:
+        return entry["identity"]
+
+    user = db.session.get(User, user_id)
+    if user is None:
+        invalidate_identity(user_id)
+        return None
+
+    portfolio_ids = [pid for (pid,) in db.session.query(Portfolio.id).filter_by(user_id=user_id)]
+    identity = Identity(user_id, user.to_dict(), portfolio_ids)
+
+    ttl_seconds = current_app.config["AUTH_CACHE_TTL_SECONDS"]
+    with _lock:
+        IDENTITY_CACHE[user_id] = {
+            "identity": identity,
+            "expires_at": now + timedelta(seconds=ttl_seconds),
+        }
+    return identity
+
+
+def invalidate_identity(user_id):
+    with _lock:
+        IDENTITY_CACHE.pop(user_id, None)
+
+
+def init_identity(jwt):
+    @jwt.user_lookup_loader
+    def _lookup_identity(_jwt_header, jwt_data):
+        return load_identity(int(jwt_data[current_app.config["JWT_IDENTITY_CLAIM"]]))
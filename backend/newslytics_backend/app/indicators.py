@@ -0,0 +1,234 @@
+"""
+Technische Indikatoren auf den gecachten Kursdaten (Schlusskurse).
+
+Jeder Indikator hat
+- compute(closes, param)               -> (values, aux)   komplette Berechnung, vektorisiert
+- extend(closes, values, aux, start, param) -> (values, aux)
+  rechnet nur die Positionen ab `start` neu und nutzt dafür den Zustand an
+  Position start - 1 (EMA-Wert, Wilder-Mittelwerte, laufendes Hoch, ...)
+
+Ergebnisse werden in INDICATOR_CACHE pro (symbol, range, interval, indicator,
+param) gehalten. Kommen neue Bars dazu (oder ändert sich der letzte, noch
+offene Bar), wird nur der Rand fortgeschrieben statt die ganze Historie neu zu
+rechnen. Das Ergebnis ist immer dasselbe wie bei kompletter Berechnung über
+den angefragten Frame; beginnt der Frame woanders, wird neu gerechnet.
+
+pandas/NumPy werden wie yfinance erst bei Bedarf importiert.
+"""
+import math
+
+INDICATOR_CACHE = {}  # Key: (symbol, period, interval, indicator, param) -> {"index", "closes", "values", "aux", "source_etag"}
+
+DEFAULT_INDICATORS = "sma:20,sma:50,rsi:14,volatility:20,drawdown"
+TRADING_DAYS_PER_YEAR = 252
+
+
+# ------- Berechnungen -------
+
+def _sma_compute(closes, window):
+    import pandas as pd
+
+    return pd.Series(closes).rolling(window).mean().to_numpy(), {}
+
+
+def _sma_extend(closes, values, aux, start, window):
+    import numpy as np
+    import pandas as pd
+
+    lo = max(0, start - window + 1)
+    tail = pd.Series(closes[lo:]).rolling(window).mean().to_numpy()
+    head = values[:start]
+    if lo == 0:
+        return tail, aux
+    return np.concatenate([head, tail[start - lo:]]), aux
+
+
+def _volatility_compute(closes, window):
+    import numpy as np
+    import pandas as pd
+
+    returns = pd.Series(np.log(closes)).diff()
+    values = returns.rolling(window).std() * math.sqrt(TRADING_DAYS_PER_YEAR)
+    return values.to_numpy(), {}
+
+
+def _volatility_extend(closes, values, aux, start, window):
+    import numpy as np
+
+    lo = max(0, start - window)
+    tail, _ = _volatility_compute(closes[lo:], window)
+    if lo == 0:
+        return tail, aux
+    return np.concatenate([values[:start], tail[start - lo:]]), aux
+
+
+def _ema_compute(closes, span):
+    import pandas as pd
+
+    return pd.Series(closes).ewm(span=span, adjust=False).mean().to_numpy(), {}
+
+
+def _ema_extend(closes, values, aux, start, span):
+    import numpy as np
+
+    alpha = 2 / (span + 1)
+    out = np.empty(len(closes) - start)
+    prev = values[start - 1]
+    for i, close in enumerate(closes[start:]):
+        prev = prev + alpha * (close - prev)
+        out[i] = prev
+    return np.concatenate([values[:start], out]), aux
+
+
+def _rsi_from_averages(avg_gain, avg_loss):
+    import numpy as np
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rs = avg_gain / avg_loss
+        rsi = 100 - 100 / (1 + rs)
+    return np.where(avg_loss == 0, 100.0, rsi)
+
+
+def _rsi_compute(closes, window):
+    import numpy as np
+    import pandas as pd
+
+    delta = pd.Series(closes).diff()
+    # Wilder-Glättung (alpha = 1 / window)
+    avg_gain = delta.clip(lower=0).ewm(alpha=1 / window, adjust=False).mean().to_numpy()
+    avg_loss = (-delta.clip(upper=0)).ewm(alpha=1 / window, adjust=False).mean().to_numpy()
+    values = _rsi_from_averages(avg_gain, avg_loss)
+    values[:window] = np.nan
+    return values, {"avg_gain": avg_gain, "avg_loss": avg_loss}
+
+
+def _rsi_extend(closes, values, aux, start, window):
+    import numpy as np
+
+    if start <= window:
+        return _rsi_compute(closes, window)
+
+    alpha = 1 / window
+    n = len(closes) - start
+    gains = np.empty(n)
+    losses = np.empty(n)
+    gain = aux["avg_gain"][start - 1]
+    loss = aux["avg_loss"][start - 1]
+    for i in range(n):
+        delta = closes[start + i] - closes[start + i - 1]
+        gain = gain + alpha * (max(delta, 0.0) - gain)
+        loss = loss + alpha * (max(-delta, 0.0) - loss)
+        gains[i] = gain
+        losses[i] = loss
+
+    avg_gain = np.concatenate([aux["avg_gain"][:start], gains])
+    avg_loss = np.concatenate([aux["avg_loss"][:start], losses])
+    values = np.concatenate([values[:start], _rsi_from_averages(gains, losses)])
+    return values, {"avg_gain": avg_gain, "avg_loss": avg_loss}
+
+
+def _drawdown_compute(closes, _param):
+    import numpy as np
+
+    peak = np.maximum.accumulate(closes)
+    return closes / peak - 1, {"peak": peak}
+
+
+def _drawdown_extend(closes, values, aux, start, _param):
+    import numpy as np
+
+    tail_peak = np.maximum.accumulate(np.concatenate([[aux["peak"][start - 1]], closes[start:]]))[1:]
+    peak = np.concatenate([aux["peak"][:start], tail_peak])
+    return np.concatenate([values[:start], closes[start:] / tail_peak - 1]), {"peak": peak}
+
+
+INDICATORS = {
+    # name: (compute, extend, Default-Parameter)
+    "sma": (_sma_compute, _sma_extend, 20),
+    "ema": (_ema_compute, _ema_extend, 20),
+    "rsi": (_rsi_compute, _rsi_extend, 14),
+    "volatility": (_volatility_compute, _volatility_extend, 20),
+    "drawdown": (_drawdown_compute, _drawdown_extend, None),
+}
+
+
+def parse_indicator_specs(raw: str):
+    """
+    "sma:20,rsi,drawdown" -> [("sma", 20), ("rsi", 14), ("drawdown", None)]
+    Wirft ValueError bei unbekannten Indikatoren oder ungültigen Parametern.
+    """
+    specs = []
+    for part in (p.strip() for p in raw.split(",")):
+        if not part:
+            continue
+        name, _, param = part.partition(":")
+        if name not in INDICATORS:
+            raise ValueError(f"Unknown indicator '{name}'")
+        default = INDICATORS[name][2]
+        if default is None:
+            specs.append((name, None))
+            continue
+        value = int(param) if param else default
+        if not 2 <= value <= 500:
+            raise ValueError(f"Parameter for '{name}' must be between 2 and 500")
+        specs.append((name, value))
+    return list(dict.fromkeys(specs))
+
+
+def spec_label(name: str, param) -> str:
+    return name if param is None else f"{name}:{param}"
+
+
+# ------- Memoisierung -------
+
+def _merge_position(memo, index, closes):
+    """
+    Position, ab der neu gerechnet werden muss, wenn der neue Frame die
+    gememoisierte Reihe fortsetzt (gleicher erster Bar); sonst None
+    (-> komplette Neuberechnung). Der letzte gememoisierte Bar wird immer neu
+    gerechnet (er kann sich intraday noch ändern).
+    """
+    memo_index = memo["index"]
+    last_ts = memo_index[-1]
+    if len(memo_index) < 2 or index[0] != memo_index[0] or last_ts not in index:
+        return None
+
+    # Rückwirkend angepasste Kurse (Splits/Dividenden) -> komplett neu rechnen
+    prev_ts = memo_index[-2]
+    if prev_ts not in index:
+        return None
+    new_prev = closes[index.get_loc(prev_ts)]
+    if not math.isclose(new_prev, memo["closes"][-2], rel_tol=1e-9):
+        return None
+    return len(memo_index) - 1
+
+
+def get_indicator_series(symbol: str, period: str, interval: str, name: str, param, entry):
+    """
+    Indikatorwerte für den Kurs-Frame eines Market-Data-Cache-Eintrags.
+    Liefert ein NumPy-Array, ausgerichtet auf entry["frame"].index.
+    """
+    compute, extend, _ = INDICATORS[name]
+    key = (symbol, period, interval, name, param)
+    frame = entry["frame"]
+    index = frame.index
+    closes = frame["Close"].to_numpy(dtype=float)
+
+    memo = INDICATOR_CACHE.get(key)
+    if memo is not None and memo["source_etag"] == entry["etag"]:
+        return memo["values"]
+
+    start = _merge_position(memo, index, closes) if memo is not None else None
+    if start is None:
+        values, aux = compute(closes, param)
+    else:
+        values, aux = extend(closes, memo["values"], memo["aux"], start, param)
+
+    INDICATOR_CACHE[key] = {
+        "index": index,
+        "closes": closes,
+        "values": values,
+        "aux": aux,
+        "source_etag": entry["etag"],
+    }
+    return values
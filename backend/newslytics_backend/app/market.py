@@ -0,0 +1,973 @@
+"""
+Market-Data-Subsystem (yfinance / Yahoo Finance).
+
+yfinance zieht beim Import pandas und NumPy mit und kostet damit mehrere
+hundert Millisekunden. Dieses Modul importiert es daher erst beim ersten
+echten Upstream-Zugriff (oder beim Start, wenn PRELOAD_MARKETDATA gesetzt ist),
+damit Auth- und CRUD-Routen davon nichts mitbekommen.
+
+Alle Upstream-Aufrufe laufen über UPSTREAM (Rate-Limit + Circuit-Breaker, siehe
+upstream.py). Schlägt ein Aufruf fehl oder wird er abgelehnt, liefern die
+get_*_cached-Funktionen abgelaufene Cache-Einträge aus, sofern vorhanden.
+
+Hinter den Prozess-Caches liegt der geteilte Store in der DB (store.py), den
+der Prefetch-Worker (`flask prefetch`) aktuell hält: Quotes, Trending-Listen,
+ISIN -> Ticker und Tages-Bars. Yahoo wird nur gefragt, wenn auch dort nichts
+Frisches liegt.
+"""
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from datetime import datetime, timedelta
+from flask import Blueprint, request, jsonify, abort
+
+from .events import broker
+from .indicators import DEFAULT_INDICATORS, get_indicator_series, parse_indicator_specs, spec_label
+from .responses import make_cache_entry, cached_json_response
+from .store import load_bars, period_start, read_entries, save_bars, write_entries
+from .upstream import UPSTREAM, UpstreamUnavailable, configure_upstream
+
+market_bp = Blueprint("market", __name__)
+
+_yf_module = None
+_fake_upstream = None  # FakeYahoo bei MARKETDATA_BACKEND=fake
+_upstream_timeout = 10
+
+
+def configure(config):
+    """Übernimmt Upstream-Backend, Timeout, Rate-Limit und Circuit-Breaker aus der Config."""
+    global _fake_upstream, _upstream_timeout
+    configure_upstream(config)
+    _upstream_timeout = config["UPSTREAM_TIMEOUT_SECONDS"]
+    if config["MARKETDATA_BACKEND"] == "fake":
+        from .fake_upstream import FakeYahoo
+
+        _fake_upstream = FakeYahoo(config["UPSTREAM_FAKE_ERROR_RATE"], config["UPSTREAM_FAKE_LATENCY"])
+    else:
+        _fake_upstream = None
+
+
+def get_yf():
+    """Importiert yfinance beim ersten Aufruf und liefert das Modul zurück."""
+    global _yf_module
+    if _fake_upstream is not None:
+        return _fake_upstream
+    if _yf_module is None:
+        import yfinance
+
+        _yf_module = yfinance
+    return _yf_module
+
+
+def preload():
+    """Lädt yfinance (inkl. pandas/NumPy) vorab, z.B. beim Worker-Start."""
+    get_yf()
+
+
+# ------- Simple In-Memory Caches -------
+
+# Kursdaten-Caching (historische Marketdata)
+MARKETDATA_CACHE = {}  # Key: (symbol, period, interval) -> {"expires_at": datetime, "payload": dict, "body": bytes, "etag": str, "frame": DataFrame}
+
+# Reduzierte Varianten (max_points) der Kursdaten, pro Auflösung
+DOWNSAMPLED_CACHE = {}  # Key: (symbol, period, interval, resolution) -> Cache-Eintrag + "source_etag"
+
+# Company-/Ticker-Info-Caching (inkl. ISIN etc.)
+COMPANYINFO_CACHE = {}  # Key: symbol -> {"expires_at": datetime, "info": dict}
+
+# Trending-Listen-Caching
+TRENDING_CACHE = {}  # Key: region -> {"expires_at": datetime, "payload": dict, "body": bytes, "etag": str}
+TRENDING_TTL_SECONDS = 300  # Trending-Listen ändern sich selten -> 5 Minuten cachen
+
+# Quote-Caching (letzter Kurs + Tagesveränderung)
+QUOTE_CACHE = {}  # Key: symbol -> {"expires_at": datetime, "quote": dict}
+
+# ISIN -> Yahoo-Ticker
+ISIN_TICKER_CACHE = {}  # Key: isin -> {"expires_at": datetime, "ticker": str | None}
+
+
+def _now_utc():
+    return datetime.utcnow()
+
+
+_deadline_executor = None
+_deadline_lock = threading.Lock()
+
+
+def _with_deadline(fn, *args):
+    """
+    Für yfinance-Aufrufe ohne timeout-Parameter (Ticker.info, get_ticker_by_isin;
+    intern 30 s): wartet höchstens UPSTREAM_TIMEOUT_SECONDS auf das Ergebnis.
+    Der Aufruf selbst läuft im Hintergrund-Thread zu Ende.
+    """
+    global _deadline_executor
+    with _deadline_lock:
+        if _deadline_executor is None:
+            _deadline_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="upstream")
+    future = _deadline_executor.submit(fn, *args)
+    try:
+        return future.result(timeout=_upstream_timeout)
+    except FutureTimeout:
+        future.cancel()
+        raise TimeoutError(f"Upstream call timed out after {_upstream_timeout} s") from None
+
+
+def _fetch_info(symbol: str) -> dict:
+    ticker = get_yf().Ticker(symbol)
+
+    # .info löst erst beim Zugriff den eigentlichen Request aus
+    info = ticker.info
+    if isinstance(info, dict):
+        return info or {}
+    basic = getattr(ticker, "basic_info", {}) or {}
+    fast = getattr(ticker, "fast_info", {}) or {}
+    return {**basic, **fast}
+
+
+def get_company_info_cached(symbol: str, ttl_seconds: int = 3600):
+    """
+    Holt Company-Info aus Cache oder via yfinance.Ticker.
+    Wird von /companyinfo, /aktie/search und /aktie/trending verwendet.
+    Ist Yahoo nicht erreichbar, wird ein abgelaufener Eintrag geliefert (falls vorhanden).
+    """
+    now = _now_utc()
+    entry = COMPANYINFO_CACHE.get(symbol)
+    if entry and entry["expires_at"] > now:
+        return entry["info"]
+
+    # Neu von yfinance holen
+    try:
+        info = UPSTREAM.call("info", _with_deadline, _fetch_info, symbol)
+    except Exception:
+        if entry is None:
+            raise
+        UPSTREAM.record_stale("info")
+        return entry["info"]
+
+    COMPANYINFO_CACHE[symbol] = {
+        "info": info,
+        "expires_at": now + timedelta(seconds=ttl_seconds),
+    }
+    return info
+
+
+# ------- Quotes (letzter Kurs) -------
+
+QUOTE_TTL_SECONDS = 15
+
+
+def _build_quote(symbol, price, previous_close, as_of=None):
+    change = None
+    change_percent = None
+    if price is not None and previous_close:
+        change = price - previous_close
+        change_percent = change / previous_close * 100
+    return {
+        "symbol": symbol,
+        "price": price,
+        "previous_close": previous_close,
+        "change": change,
+        "change_percent": change_percent,
+        "as_of": (as_of or _now_utc()).isoformat() + "Z",
+    }
+
+
+def _download_history(symbols, period: str, interval: str):
+    """
+    Lädt die Historie mehrerer Symbole mit EINEM yf.download-Aufruf.
+    Liefert {symbol: DataFrame}; Symbole ohne Daten fehlen im Ergebnis.
+    yfinance wirft bei Fehlern einzelner Symbole (auch 429) nicht, sondern
+    liefert leere Spalten; fehlende Symbole zählen deshalb als Upstream-Fehler.
+    """
+    symbols = list(symbols)
+    # yfinance stellt pro Symbol einen Request -> entsprechend viele Tokens
+    frame = UPSTREAM.call(
+        "download",
+        get_yf().download,
+        symbols,
+        cost=len(symbols),
+        period=period,
+        interval=interval,
+        group_by="ticker",
+        auto_adjust=True,
+        threads=True,
+        progress=False,
+        timeout=_upstream_timeout,
+    )
+    result = {}
+    if frame is not None and not frame.empty:
+        multi = frame.columns.nlevels > 1
+        available = set(frame.columns.get_level_values(0)) if multi else set(symbols)
+        for symbol in symbols:
+            if symbol not in available:
+                continue
+            hist = frame[symbol] if multi else frame
+            hist = hist.dropna(subset=["Close"])
+            if not hist.empty:
+                result[symbol] = hist
+
+    missing = len(symbols) - len(result)
+    if missing:
+        UPSTREAM.record_failures("download", missing)
+    return result
+
+
+def _fetch_quotes(symbols):
+    """Letzter Kurs + Vortagesschluss für alle Symbole aus einem gebündelten Tages-Download."""
+    quotes = {}
+    for symbol, hist in _download_history(symbols, period="5d", interval="1d").items():
+        closes = hist["Close"]
+        price = float(closes.iloc[-1])
+        previous_close = float(closes.iloc[-2]) if len(closes) > 1 else None
+        quotes[symbol] = _build_quote(symbol, price, previous_close)
+    return quotes
+
+
+def _store_quote(symbol: str, quote: dict, now, ttl_seconds: int):
+    """Legt einen Quote im Cache ab und pusht ihn an SSE-Abonnenten, wenn er sich geändert hat."""
+    previous = QUOTE_CACHE.get(symbol)
+    QUOTE_CACHE[symbol] = {
+        "quote": quote,
+        "expires_at": now + timedelta(seconds=ttl_seconds),
+    }
+    if previous is None or previous["quote"]["price"] != quote["price"]:
+        broker.publish(f"quote:{symbol}", "quote", quote)
+
+
+def get_quotes_cached(symbols, ttl_seconds: int = QUOTE_TTL_SECONDS):
+    """
+    Liefert {symbol: quote} für alle Symbole.
+    Treffer kommen aus QUOTE_CACHE bzw. dem geteilten Store, alle übrigen
+    Symbole werden gemeinsam in einem Upstream-Request geladen.
+    Schlägt der Upstream-Abruf fehl oder liefert er für einzelne Symbole
+    nichts, kommen für diese abgelaufene Quotes aus dem Cache; Symbole ganz
+    ohne Daten fehlen im Ergebnis.
+    """
+    now = _now_utc()
+    quotes = {}
+    misses = []
+    for symbol in dict.fromkeys(symbols):
+        entry = QUOTE_CACHE.get(symbol)
+        if entry and entry["expires_at"] > now:
+            quotes[symbol] = entry["quote"]
+        else:
+            misses.append(symbol)
+
+    if misses:
+        shared = read_entries([f"quote:{symbol}" for symbol in misses], now)
+        for symbol in misses:
+            entry = shared.get(f"quote:{symbol}")
+            if entry is not None:
+                _store_quote(symbol, entry["payload"], now, (entry["expires_at"] - now).total_seconds())
+                quotes[symbol] = entry["payload"]
+        misses = [symbol for symbol in misses if symbol not in quotes]
+
+    if misses:
+        try:
+            fetched = _fetch_quotes(misses)
+        except Exception:
+            fetched = {}
+        for symbol in misses:
+            if symbol in fetched:
+                _store_quote(symbol, fetched[symbol], now, ttl_seconds)
+                quotes[symbol] = fetched[symbol]
+                continue
+            entry = QUOTE_CACHE.get(symbol)
+            if entry is not None:
+                UPSTREAM.record_stale("quotes")
+                quotes[symbol] = entry["quote"]
+        write_entries({f"quote:{symbol}": quote for symbol, quote in fetched.items()}, ttl_seconds, now)
+    return quotes
+
+
+ISIN_PATTERN = re.compile(r"^[A-Z]{2}[A-Z0-9]{9}[0-9]$")
+
+
+def resolve_ticker(isin: str, ttl_seconds: int = 7 * 24 * 3600):
+    """
+    Bildet eine ISIN auf ein Yahoo-Ticker-Symbol ab (gecacht, auch "nicht gefunden").
+    Werte, die keine ISIN sind, werden als Ticker durchgereicht.
+    Upstream-Fehler werden nicht gecacht, dann gilt ein abgelaufener Eintrag.
+    """
+    if not isin or not ISIN_PATTERN.match(isin):
+        return isin or None
+
+    now = _now_utc()
+    entry = ISIN_TICKER_CACHE.get(isin)
+    if entry and entry["expires_at"] > now:
+        return entry["ticker"]
+
+    shared = read_entries([f"isin:{isin}"], now).get(f"isin:{isin}")
+    if shared is not None:
+        ISIN_TICKER_CACHE[isin] = {"ticker": shared["payload"]["ticker"], "expires_at": shared["expires_at"]}
+        return shared["payload"]["ticker"]
+
+    try:
+        ticker = UPSTREAM.call("isin", _with_deadline, get_yf().utils.get_ticker_by_isin, isin) or None
+    except Exception:
+        if entry is None:
+            return None
+        UPSTREAM.record_stale("isin")
+        return entry["ticker"]
+
+    ISIN_TICKER_CACHE[isin] = {
+        "ticker": ticker,
+        "expires_at": now + timedelta(seconds=ttl_seconds),
+    }
+    write_entries({f"isin:{isin}": {"ticker": ticker}}, ttl_seconds, now)
+    return ticker
+
+
+class QuotePoller:
+    """
+    Ein Hintergrund-Thread pro Prozess, der alle per SSE abonnierten Symbole
+    gemeinsam aktualisiert: ein gebündelter Upstream-Abruf pro Intervall,
+    egal wie viele Clients zuhören. Beendet sich, wenn niemand mehr zuhört.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def ensure_running(self, interval_seconds: int, app):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(
+                target=self._run,
+                args=(interval_seconds, app),
+                name="quote-poller",
+                daemon=True,
+            )
+            self._thread.start()
+
+    def _run(self, interval_seconds: int, app):
+        try:
+            while True:
+                with self._lock:
+                    symbols = [t.split(":", 1)[1] for t in broker.topics("quote:")]
+                    if not symbols:
+                        self._thread = None
+                        return
+                try:
+                    # App-Kontext für den geteilten Store (DB)
+                    with app.app_context():
+                        get_quotes_cached(symbols, ttl_seconds=interval_seconds)
+                except Exception:
+                    app.logger.exception("Quote-Poller: Aktualisierung fehlgeschlagen")
+                time.sleep(interval_seconds)
+        finally:
+            # Auch bei unerwartetem Abbruch freigeben, damit ensure_running neu startet
+            with self._lock:
+                if self._thread is threading.current_thread():
+                    self._thread = None
+
+
+QUOTE_POLLER = QuotePoller()
+
+
+# ------- Kursdaten (Historie) -------
+
+MARKETDATA_TTL_SECONDS = 300  # 5 Minuten
+# Gespeicherte Bars gelten als frisch, wenn der Prefetch-Worker sie so kürzlich abgeglichen hat
+BAR_STORE_MAX_AGE_SECONDS = 2 * MARKETDATA_TTL_SECONDS
+MAX_BATCH_SYMBOLS = 20
+MIN_MAX_POINTS = 10
+# max_points wird auf eine dieser Auflösungen abgerundet, damit der Cache pro Reihe begrenzt bleibt
+DOWNSAMPLE_RESOLUTIONS = (10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+
+def _history_payload(symbol: str, period: str, interval: str, hist) -> dict:
+    volumes = hist["Volume"].tolist()
+    data = [
+        {
+            "datetime": ts.isoformat(),
+            "open": float(o),
+            "high": float(h),
+            "low": float(l),
+            "close": float(c),
+            "volume": int(v) if v == v else None,  # handle NaN
+        }
+        for ts, o, h, l, c, v in zip(
+            hist.index,
+            hist["Open"].tolist(),
+            hist["High"].tolist(),
+            hist["Low"].tolist(),
+            hist["Close"].tolist(),
+            volumes,
+        )
+    ]
+    return {
+        "symbol": symbol,
+        "range": period,
+        "interval": interval,
+        "data": data,
+    }
+
+
+def _store_history(symbol: str, period: str, interval: str, hist, now):
+    """Legt Payload, serialisierte Bytes und DataFrame gemeinsam im Market-Data-Cache ab."""
+    payload = _history_payload(symbol, period, interval, hist)
+    entry = make_cache_entry(payload, MARKETDATA_TTL_SECONDS, now, frame=hist)
+    MARKETDATA_CACHE[(symbol, period, interval)] = entry
+    return entry
+
+
+def _history_from_store(symbol: str, period: str, interval: str, now):
+    """Cache-Eintrag aus den gespeicherten Bars oder None (fehlt, unvollständig, veraltet)."""
+    start = period_start(period, now)
+    if start is None:
+        return None
+    hist = load_bars(symbol, interval, start, BAR_STORE_MAX_AGE_SECONDS, now)
+    if hist is None:
+        return None
+    return _store_history(symbol, period, interval, hist, now)
+
+
+def _save_history_bars(symbol: str, period: str, interval: str, hist, now):
+    start = period_start(period, now)
+    if start is not None:
+        save_bars(symbol, interval, hist, start, now)
+
+
+def get_history_cached(symbol: str, period: str, interval: str):
+    """
+    Cache-Eintrag für (symbol, period, interval) oder None, wenn yfinance keine Daten hat.
+    Fehler beim Upstream-Abruf (auch ein leeres Ergebnis) werden durchgereicht
+    bzw. ergeben None, außer es gibt einen abgelaufenen Eintrag, der
+    stattdessen geliefert wird.
+    """
+    now = _now_utc()
+    entry = MARKETDATA_CACHE.get((symbol, period, interval))
+    if entry and entry["expires_at"] > now:
+        return entry
+
+    stored = _history_from_store(symbol, period, interval, now)
+    if stored is not None:
+        return stored
+
+    try:
+        hist = UPSTREAM.call(
+            "history",
+            get_yf().Ticker(symbol).history,
+            period=period,
+            interval=interval,
+            timeout=_upstream_timeout,
+        )
+    except Exception:
+        if entry is None:
+            raise
+        UPSTREAM.record_stale("history")
+        return entry
+    if hist.empty:
+        # Wie bei yf.download: kein Fehler von yfinance, aber keine Daten
+        UPSTREAM.record_failures("history")
+        if entry is not None:
+            UPSTREAM.record_stale("history")
+        return entry
+    _save_history_bars(symbol, period, interval, hist, now)
+    return _store_history(symbol, period, interval, hist, now)
+
+
+def _downsample_ohlc(hist, max_points: int):
+    """
+    OHLC-Bucket-Aggregation (vektorisiert): je `bucket` aufeinanderfolgende Bars
+    werden zu einem Bar zusammengefasst (Open des ersten, High-Max, Low-Min,
+    Close des letzten, Volumen-Summe). Hochs/Tiefs bleiben so im Chart erhalten.
+    """
+    import numpy as np
+    import pandas as pd
+
+    n = len(hist)
+    bucket = -(-n // max_points)  # ceil
+    starts = np.arange(0, n, bucket)
+    ends = np.minimum(starts + bucket, n) - 1
+
+    volume = hist["Volume"].to_numpy(dtype=float)
+    volume_sum = np.add.reduceat(np.nan_to_num(volume), starts)
+    # Buckets ganz ohne Volumen bleiben NaN (-> null im JSON)
+    volume_sum[np.logical_and.reduceat(np.isnan(volume), starts)] = np.nan
+
+    frame = pd.DataFrame(
+        {
+            "Open": hist["Open"].to_numpy()[starts],
+            "High": np.fmax.reduceat(hist["High"].to_numpy(dtype=float), starts),
+            "Low": np.fmin.reduceat(hist["Low"].to_numpy(dtype=float), starts),
+            "Close": hist["Close"].to_numpy()[ends],
+            "Volume": volume_sum,
+        },
+        index=hist.index[starts],
+    )
+    return frame, bucket
+
+
+def get_downsampled_cached(entry, symbol: str, period: str, interval: str, max_points: int):
+    """
+    Auf höchstens max_points reduzierte Variante eines Market-Data-Cache-Eintrags.
+    max_points wird auf eine der DOWNSAMPLE_RESOLUTIONS abgerundet. Wird pro
+    Auflösung gecacht und gilt, solange der Basis-Eintrag gilt.
+    """
+    if len(entry["frame"]) <= max_points:
+        return entry
+    resolution = max(r for r in DOWNSAMPLE_RESOLUTIONS if r <= max_points)
+
+    key = (symbol, period, interval, resolution)
+    cached = DOWNSAMPLED_CACHE.get(key)
+    if cached and cached["source_etag"] == entry["etag"]:
+        return cached
+
+    frame, bucket = _downsample_ohlc(entry["frame"], resolution)
+    payload = _history_payload(symbol, period, interval, frame)
+    payload["max_points"] = resolution
+    payload["bucket_size"] = bucket
+
+    ttl_seconds = max(0, int((entry["expires_at"] - _now_utc()).total_seconds()))
+    cached = make_cache_entry(payload, ttl_seconds, _now_utc(), frame=frame, source_etag=entry["etag"])
+    # Varianten eines veralteten Basis-Eintrags (andere Auflösungen) verwerfen
+    for other in [k for k, v in list(DOWNSAMPLED_CACHE.items()) if k[:3] == key[:3] and v["source_etag"] != entry["etag"]]:
+        DOWNSAMPLED_CACHE.pop(other, None)
+    DOWNSAMPLED_CACHE[key] = cached
+    return cached
+
+
+def get_histories_cached(symbols, period: str, interval: str):
+    """
+    Wie get_history_cached für mehrere Symbole: Cache-Treffer direkt, alle
+    Misses gemeinsam in EINEM Upstream-Request. Die Einzel-Einträge landen im
+    Cache, sodass spätere /marketdata-Aufrufe pro Symbol ebenfalls treffen.
+    Liefert {symbol: entry}; Symbole ohne Daten fehlen. Schlägt der Download
+    fehl oder fehlen darin einzelne Symbole, kommen für diese abgelaufene
+    Einträge zum Zug; gibt es bei einer Exception gar keine, wird sie
+    durchgereicht.
+    """
+    now = _now_utc()
+    entries = {}
+    misses = []
+    for symbol in dict.fromkeys(symbols):
+        entry = MARKETDATA_CACHE.get((symbol, period, interval))
+        if entry and entry["expires_at"] > now:
+            entries[symbol] = entry
+        else:
+            stored = _history_from_store(symbol, period, interval, now)
+            if stored is not None:
+                entries[symbol] = stored
+            else:
+                misses.append(symbol)
+
+    if misses:
+        try:
+            downloaded = _download_history(misses, period, interval)
+        except Exception:
+            if not any((symbol, period, interval) in MARKETDATA_CACHE for symbol in misses):
+                raise
+            downloaded = {}
+        for symbol in misses:
+            if symbol in downloaded:
+                _save_history_bars(symbol, period, interval, downloaded[symbol], now)
+                entries[symbol] = _store_history(symbol, period, interval, downloaded[symbol], now)
+                continue
+            entry = MARKETDATA_CACHE.get((symbol, period, interval))
+            if entry is not None:
+                UPSTREAM.record_stale("download")
+                entries[symbol] = entry
+    return entries
+
+
+def align_closes(entries: dict, interval: str, how: str):
+    """
+    Bringt die Schlusskurse mehrerer Symbole auf einen gemeinsamen Zeitindex.
+    Tages-/Wochen-/Monatsbars werden auf das Datum normalisiert (Börsen in
+    unterschiedlichen Zeitzonen), Intraday-Bars auf UTC.
+    how="union": alle Zeitpunkte, Lücken mit letztem Kurs gefüllt
+    how="intersection": nur Zeitpunkte, an denen alle Symbole handeln
+    """
+    import pandas as pd
+
+    daily = interval.endswith(("d", "wk", "mo"))
+    closes = {}
+    for symbol, entry in entries.items():
+        series = entry["frame"]["Close"]
+        index = series.index
+        if daily:
+            index = pd.DatetimeIndex([ts.date() for ts in index])
+        elif index.tz is not None:
+            index = index.tz_convert("UTC")
+        closes[symbol] = pd.Series(series.to_numpy(), index=index)
+
+    frame = pd.concat(closes, axis=1, join="outer" if how == "union" else "inner").sort_index()
+    frame = frame[~frame.index.duplicated(keep="last")]
+    if how == "union":
+        frame = frame.ffill()
+
+    return {
+        "index": [ts.date().isoformat() if daily else ts.isoformat() for ts in frame.index],
+        "series": {
+            symbol: [None if v != v else float(v) for v in frame[symbol].tolist()]
+            for symbol in frame.columns
+        },
+    }
+
+
+# ======================
+#      Market-Data
+# ======================
+@market_bp.route("/marketdata", methods=["GET"])
+def marketdata():
+    symbol = request.args.get("symbol")
+    if not symbol:
+        abort(400, description="Query parameter 'symbol' is required (e.g., AAPL, MSFT, BMW.DE).")
+
+    # Default values if not provided
+    period = request.args.get("range", "1mo")
+    interval = request.args.get("interval", "1d")
+
+    # Optional: serverseitig auf max_points Bars reduzieren (für lange Zeiträume)
+    max_points = request.args.get("max_points")
+    if max_points is not None:
+        try:
+            max_points = int(max_points)
+        except ValueError:
+            abort(400, description="Query parameter 'max_points' must be an integer.")
+        if max_points < MIN_MAX_POINTS:
+            abort(400, description=f"Query parameter 'max_points' must be at least {MIN_MAX_POINTS}.")
+
+    # Cache-Treffer oder frische Daten (TTL 5 Minuten)
+    try:
+        cache_entry = get_history_cached(symbol, period, interval)
+    except UpstreamUnavailable as e:
+        abort(503, description=f"Market data provider unavailable: {str(e)}")
+    except Exception as e:
+        abort(500, description=f"Error fetching market data: {str(e)}")
+
+    if cache_entry is None:
+        abort(404, description=f"No market data found for symbol '{symbol}'.")
+
+    if max_points is not None:
+        cache_entry = get_downsampled_cached(cache_entry, symbol, period, interval, max_points)
+
+    # Fertig serialisiert aus dem Cache, inkl. ETag/304
+    return cached_json_response(cache_entry)
+
+
+@market_bp.route("/marketdata/batch", methods=["GET"])
+def marketdata_batch():
+    """
+    Kursdaten für mehrere Symbole: ?symbols=AAPL,MSFT&range=1y&interval=1d
+    Optional align=union|intersection -> Schlusskurse auf gemeinsamem Zeitindex.
+    Nicht gecachte Symbole werden gemeinsam in einem Upstream-Request geladen.
+    """
+    symbols = [s.strip() for s in request.args.get("symbols", "").split(",") if s.strip()]
+    symbols = list(dict.fromkeys(symbols))
+    if not symbols:
+        abort(400, description="Query parameter 'symbols' is required (e.g., AAPL,MSFT,BMW.DE).")
+    if len(symbols) > MAX_BATCH_SYMBOLS:
+        abort(400, description=f"At most {MAX_BATCH_SYMBOLS} symbols per request.")
+
+    period = request.args.get("range", "1mo")
+    interval = request.args.get("interval", "1d")
+    align = request.args.get("align")
+    if align not in (None, "union", "intersection"):
+        abort(400, description="Query parameter 'align' must be 'union' or 'intersection'.")
+
+    try:
+        entries = get_histories_cached(symbols, period, interval)
+    except UpstreamUnavailable as e:
+        abort(503, description=f"Market data provider unavailable: {str(e)}")
+    except Exception as e:
+        abort(500, description=f"Error fetching market data: {str(e)}")
+
+    if not entries:
+        abort(404, description="No market data found for the requested symbols.")
+
+    response = {
+        "range": period,
+        "interval": interval,
+        "missing": [s for s in symbols if s not in entries],
+    }
+    if align:
+        response["align"] = align
+        response.update(align_closes(entries, interval, align))
+    else:
+        response["data"] = {s: entries[s]["payload"]["data"] for s in symbols if s in entries}
+
+    return jsonify(response), 200
+
+# ======================
+#      Indikatoren
+# ======================
+
+@market_bp.route("/indicators", methods=["GET"])
+def indicators():
+    """
+    Technische Indikatoren auf den gecachten Kursdaten:
+    ?symbol=AAPL&range=1y&interval=1d&indicators=sma:20,ema:12,rsi:14,volatility:20,drawdown
+    Ergebnisse werden pro (symbol, range, interval, indicator, parameter) gemerkt und
+    bei neuen Bars nur fortgeschrieben.
+    """
+    symbol = request.args.get("symbol")
+    if not symbol:
+        abort(400, description="Query parameter 'symbol' is required (e.g., AAPL, MSFT, BMW.DE).")
+
+    period = request.args.get("range", "1y")
+    interval = request.args.get("interval", "1d")
+
+    try:
+        specs = parse_indicator_specs(request.args.get("indicators", DEFAULT_INDICATORS))
+    except ValueError as e:
+        abort(400, description=str(e))
+    if not specs:
+        abort(400, description="Query parameter 'indicators' must not be empty.")
+
+    try:
+        cache_entry = get_history_cached(symbol, period, interval)
+    except UpstreamUnavailable as e:
+        abort(503, description=f"Market data provider unavailable: {str(e)}")
+    except Exception as e:
+        abort(500, description=f"Error fetching market data: {str(e)}")
+
+    if cache_entry is None:
+        abort(404, description=f"No market data found for symbol '{symbol}'.")
+
+    series = {}
+    for name, param in specs:
+        values = get_indicator_series(symbol, period, interval, name, param, cache_entry)
+        series[spec_label(name, param)] = [None if v != v else float(v) for v in values.tolist()]
+
+    return jsonify({
+        "symbol": symbol,
+        "range": period,
+        "interval": interval,
+        "datetime": [ts.isoformat() for ts in cache_entry["frame"].index],
+        "indicators": series,
+    }), 200
+
+
+# ======================
+#      Company-Info
+# ======================
+
+@market_bp.route("/companyinfo", methods=["GET"])
+def companyinfo():
+    symbol = request.args.get("symbol")
+    if not symbol:
+        abort(400, description="Query parameter 'symbol' is required (e.g., AAPL, MSFT, BMW.DE).")
+
+    try:
+        info = get_company_info_cached(symbol)
+    except UpstreamUnavailable as e:
+        abort(503, description=f"Market data provider unavailable: {str(e)}")
+    except Exception as e:
+        abort(500, description=f"Error fetching company information: {str(e)}")
+
+    if not info:
+        abort(404, description=f"No company data found for symbol '{symbol}'.")
+
+    return jsonify({
+        "symbol": symbol,
+        "company_data": info
+    }), 200
+
+@market_bp.route("/aktie/search", methods=["GET"])
+def aktie_search():
+    """
+    Suche nach Aktien über Namen/Firma/Symbol mit yfinance.
+    - 1x yf.Search(...) für die eigentliche Suche
+    - danach pro gefundenem Symbol ein yf.Ticker(symbol).info Call, um ISIN zu holen
+    Antwort: nur Aktien-Daten (quotes), angereichert um 'ticker' und 'isin'.
+    """
+    # Name aus Query-Param holen: ?name=Apple oder ?q=Apple
+    query = request.args.get("name") or request.args.get("q")
+    if not query:
+        abort(400, description="Query parameter 'name' (oder 'q') ist erforderlich, z.B. ?name=Apple")
+
+    try:
+        # 1. API-Call: Suche nach passenden Symbolen
+        search = UPSTREAM.call("search", get_yf().Search, query, max_results=10, timeout=_upstream_timeout)
+        quotes = search.quotes or []
+    except UpstreamUnavailable as e:
+        abort(503, description=f"Market data provider unavailable: {str(e)}")
+    except Exception as e:
+        abort(500, description=f"Fehler bei der Aktie-Suche: {str(e)}")
+
+    if not quotes:
+        abort(404, description=f"Keine Aktien-Treffer für '{query}' gefunden.")
+
+    # 2. Für jedes gefundene Symbol ISIN nachladen
+    #    (zusätzlicher API-Call pro Symbol, sofern nicht im Company-Info-Cache)
+    for q in quotes:
+        symbol = q.get("symbol")
+        isin = None
+
+        if symbol:
+            try:
+                info = get_company_info_cached(symbol)
+                # je nach Datenquelle kann der Key 'isin' oder 'ISIN' heißen oder gar nicht existieren
+                isin = info.get("isin") or info.get("ISIN")
+            except Exception:
+                isin = None  # Wenn etwas schiefgeht (auch Rate-Limit/Breaker), ISIN einfach leer lassen
+
+        # ticker-Feld explizit setzen (alias für symbol)
+        q["ticker"] = symbol
+        # ISIN-Feld ergänzen
+        q["isin"] = isin
+
+    # Nur Aktien-Daten zurückgeben
+    return jsonify({
+        "query": query,
+        "quotes": quotes
+    }), 200
+
+def _fetch_trending(region: str) -> dict:
+    if _fake_upstream is not None:
+        return _fake_upstream.fetch_trending(region)
+
+    import requests
+
+    url = f"https://query1.finance.yahoo.com/v1/finance/trending/{region}"
+    headers = {
+        "User-Agent": "Mozilla/5.0"
+    }
+    resp = requests.get(url, headers=headers, timeout=_upstream_timeout)
+    resp.raise_for_status()
+    return resp.json()
+
+
+def load_trending(region: str) -> dict:
+    """
+    Lädt die Trending-Liste einer Region und reichert sie mit Company-Infos an.
+    LookupError, wenn Yahoo für die Region nichts liefert; Upstream-Fehler
+    werden durchgereicht.
+    """
+    # 1) Trending-Daten von Yahoo holen
+    data = UPSTREAM.call("trending", _fetch_trending, region)
+
+    # 2) Quotes aus der Antwort extrahieren
+    try:
+        results = data.get("finance", {}).get("result", [])
+    except AttributeError:
+        raise ValueError("Antwortformat von Yahoo Finance unerwartet.")
+    if not results:
+        raise LookupError(f"Keine Trending-Daten für Region '{region}' gefunden.")
+
+    quotes = results[0].get("quotes", [])
+    if not quotes:
+        raise LookupError(f"Keine Trending-Aktien für Region '{region}' gefunden.")
+
+    # 3) Für jeden Ticker Details + ISIN via yfinance holen
+    enriched = []
+    for q in quotes:
+        symbol = q.get("symbol")
+        info = {}
+        if symbol:
+            try:
+                info = get_company_info_cached(symbol)
+            except Exception:
+                info = {}
+
+        enriched.append({
+            # Basis
+            "symbol": symbol,
+            "ticker": symbol,
+
+            # Namen
+            "shortname": (
+                info.get("shortName")
+                or q.get("shortName")
+                or q.get("shortname")
+            ),
+            "longname": (
+                info.get("longName")
+                or q.get("longName")
+                or q.get("longname")
+            ),
+
+            # Börse / Markt
+            "exchange": (
+                info.get("exchange")
+                or q.get("fullExchangeName")
+                or q.get("exchange")
+            ),
+
+            # Finanzdaten
+            "currency": info.get("currency"),
+            "sector": info.get("sector"),
+            "industry": info.get("industry"),
+            "quoteType": info.get("quoteType") or q.get("quoteType"),
+            "regularMarketPrice": info.get("regularMarketPrice"),
+            "regularMarketChangePercent": info.get("regularMarketChangePercent"),
+
+            # ISIN (falls verfügbar)
+            "isin": info.get("isin") or info.get("ISIN"),
+
+            # optional: der rohe Trending-Eintrag von Yahoo
+            "raw_trending": q,
+        })
+
+    return {
+        "region": region,
+        "count": len(enriched),
+        "results": enriched,
+    }
+
+
+def store_trending(region: str, payload: dict, now, ttl_seconds: int = TRENDING_TTL_SECONDS):
+    """Legt eine Trending-Liste im Prozess-Cache und im geteilten Store ab."""
+    cache_entry = make_cache_entry(payload, ttl_seconds, now)
+    TRENDING_CACHE[region] = cache_entry
+    write_entries({f"trending:{region}": payload}, ttl_seconds, now)
+    return cache_entry
+
+
+@market_bp.route("/aktie/trending", methods=["GET"])
+def aktie_trending():
+    """
+    Liefert Trending-Aktien von Yahoo Finance.
+    - Holt Trending-List direkt vom Yahoo-Endpoint (über requests)
+    - Anreichern der Ticker mit Details über yfinance.Ticker(...).info
+    - Gibt je Aktie u.a. Ticker, ISIN, Namen, Exchange, Sector, Industry, Preis zurück.
+    Reihenfolge: Prozess-Cache -> geteilter Store (Prefetch-Worker) -> Yahoo.
+    """
+
+    # Optionaler Query-Parameter: Region (Standard: US)
+    region = request.args.get("region", "US")
+
+    now = _now_utc()
+    cache_entry = TRENDING_CACHE.get(region)
+    if cache_entry and cache_entry["expires_at"] > now:
+        return cached_json_response(cache_entry)
+
+    shared = read_entries([f"trending:{region}"], now).get(f"trending:{region}")
+    if shared is not None:
+        ttl_seconds = (shared["expires_at"] - now).total_seconds()
+        cache_entry = make_cache_entry(shared["payload"], ttl_seconds, now)
+        TRENDING_CACHE[region] = cache_entry
+        return cached_json_response(cache_entry)
+
+    try:
+        payload = load_trending(region)
+    except LookupError as e:
+        abort(404, description=str(e))
+    except Exception as e:
+        if cache_entry is not None:
+            # Abgelaufene Liste ist besser als ein Fehler
+            UPSTREAM.record_stale("trending")
+            return cached_json_response(cache_entry)
+        if isinstance(e, UpstreamUnavailable):
+            abort(503, description=f"Market data provider unavailable: {str(e)}")
+        abort(500, description=f"Fehler beim Abrufen der Trending-Aktien: {str(e)}")
+
+    return cached_json_response(store_trending(region, payload, now))
+
+
+# ======================
+#   Upstream-Metriken
+# ======================
+
+@market_bp.route("/upstream/metrics", methods=["GET"])
+def upstream_metrics():
+    """Zustand von Rate-Limiter und Circuit-Breaker plus Zähler pro Upstream-Operation."""
+    return jsonify({
+        "backend": "fake" if _fake_upstream is not None else "yahoo",
+        **UPSTREAM.metrics(),
+    }), 200
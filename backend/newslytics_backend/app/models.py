@@ -3,7 +3,8 @@ import enum
 
 from flask_sqlalchemy import SQLAlchemy
 from sqlalchemy import Enum as SAEnum, Numeric
-from werkzeug.security import generate_password_hash, check_password_hash
+
+from .security import hash_password, verify_password
 
 db = SQLAlchemy()
 
@@ -32,27 +33,32 @@ class User(db.Model):
     # In echt würdest du hier ein Hash speichern
     password = db.Column(db.String(255), nullable=False)
 
+    # passive_deletes: Kinder werden per ON DELETE CASCADE bzw. per Bulk-DELETE
+    # (deletion.py) entfernt, ohne sie vorher als ORM-Objekte zu laden
     portfolios = db.relationship(
         "Portfolio",
         back_populates="user",
         cascade="all, delete-orphan",
+        passive_deletes=True,
     )
     watchlist_entries = db.relationship(
         "Watchlist",
         back_populates="user",
         cascade="all, delete-orphan",
+        passive_deletes=True,
     )
     chats = db.relationship(
         "Chatverlauf",
         back_populates="user",
         cascade="all, delete-orphan",
+        passive_deletes=True,
     )
 
     def set_password(self, raw_password: str):
-        self.password = generate_password_hash(raw_password)
+        self.password = hash_password(raw_password)
 
     def check_password(self, raw_password: str) -> bool:
-        return check_password_hash(self.password, raw_password)
+        return verify_password(self.password, raw_password)
 
     def to_dict(self):
         return {
@@ -71,13 +77,22 @@ class Portfolio(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(120), nullable=False)
 
-    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
+    user_id = db.Column(
+        db.Integer, db.ForeignKey("users.id", ondelete="CASCADE"), nullable=False
+    )
     user = db.relationship("User", back_populates="portfolios")
 
     transactions = db.relationship(
         "Transaktion",
         back_populates="portfolio",
         cascade="all, delete-orphan",
+        passive_deletes=True,
+    )
+    positions = db.relationship(
+        "Position",
+        back_populates="portfolio",
+        cascade="all, delete-orphan",
+        passive_deletes=True,
     )
 
     def to_dict(self):
@@ -118,6 +133,11 @@ class Aktie(db.Model):
         back_populates="aktie",
         cascade="all, delete-orphan",
     )
+    positions = db.relationship(
+        "Position",
+        back_populates="aktie",
+        cascade="all, delete-orphan",
+    )
 
     def to_dict(self):
         return {
@@ -151,7 +171,7 @@ class Transaktion(db.Model):
 
     aktie_id = db.Column(db.Integer, db.ForeignKey("aktien.id"), nullable=False)
     portfolio_id = db.Column(
-        db.Integer, db.ForeignKey("portfolios.id"), nullable=False
+        db.Integer, db.ForeignKey("portfolios.id", ondelete="CASCADE"), nullable=False
     )
 
     aktie = db.relationship("Aktie", back_populates="transactions")
@@ -168,6 +188,91 @@ class Transaktion(db.Model):
         }
 
 
+# ----- Positionen (Bestand je Portfolio und Aktie) -----
+
+class Position(db.Model):
+    """
+    Aus den Transaktionen abgeleiteter Bestand, wird bei jeder Transaktions-
+    Änderung in derselben DB-Transaktion fortgeschrieben (siehe positions.py).
+    einstandswert = Summe(menge * kaufpreis) aller Transaktionen.
+    """
+
+    __tablename__ = "positions"
+    __table_args__ = (
+        db.UniqueConstraint("portfolio_id", "aktie_id", name="uq_positions_portfolio_aktie"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    menge = db.Column(Numeric(18, 4), nullable=False, default=0)
+    einstandswert = db.Column(Numeric(24, 4), nullable=False, default=0)
+    letztes_kaufdatum = db.Column(db.Date)
+    anzahl_transaktionen = db.Column(db.Integer, nullable=False, default=0)
+
+    portfolio_id = db.Column(
+        db.Integer, db.ForeignKey("portfolios.id", ondelete="CASCADE"), nullable=False
+    )
+    aktie_id = db.Column(db.Integer, db.ForeignKey("aktien.id"), nullable=False)
+
+    portfolio = db.relationship("Portfolio", back_populates="positions")
+    aktie = db.relationship("Aktie", back_populates="positions")
+
+    def to_dict(self):
+        return {
+            "portfolio_id": self.portfolio_id,
+            "aktie_id": self.aktie_id,
+            "menge": float(self.menge),
+            "einstandswert": float(self.einstandswert),
+            "letztes_kaufdatum": self.letztes_kaufdatum.isoformat()
+            if self.letztes_kaufdatum is not None
+            else None,
+            "anzahl_transaktionen": self.anzahl_transaktionen,
+        }
+
+
+# ----- Geteilter Market-Data-Store (Prefetch-Worker <-> alle Web-Worker) -----
+
+class MarketCacheEntry(db.Model):
+    """
+    Prozessübergreifender Cache für Upstream-Ergebnisse (Quotes, Trending-Listen,
+    ISIN -> Ticker). Key z.B. "quote:AAPL", "trending:US", "isin:US0378331005".
+    """
+
+    __tablename__ = "market_cache"
+
+    key = db.Column(db.String(255), primary_key=True)
+    payload = db.Column(db.JSON, nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+
+class PriceSeries(db.Model):
+    """Metadaten einer gespeicherten Kursreihe: abgedeckter Zeitraum + letzter Abgleich."""
+
+    __tablename__ = "price_series"
+
+    symbol = db.Column(db.String(32), primary_key=True)
+    interval = db.Column(db.String(8), primary_key=True)
+    timezone = db.Column(db.String(64))
+    # Beginn des ältesten vollständig geladenen Zeitraums (UTC, naiv)
+    covered_from = db.Column(db.DateTime, nullable=False)
+    last_ts = db.Column(db.DateTime, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+
+class PriceBar(db.Model):
+    __tablename__ = "price_bars"
+
+    symbol = db.Column(db.String(32), primary_key=True)
+    interval = db.Column(db.String(8), primary_key=True)
+    ts = db.Column(db.DateTime, primary_key=True)  # UTC, naiv
+
+    open = db.Column(db.Float, nullable=False)
+    high = db.Column(db.Float, nullable=False)
+    low = db.Column(db.Float, nullable=False)
+    close = db.Column(db.Float, nullable=False)
+    volume = db.Column(db.BigInteger)
+
+
 # ----- Watchlist (User <-> Aktie) -----
 
 class Watchlist(db.Model):
@@ -180,7 +285,9 @@ class Watchlist(db.Model):
 
     id = db.Column(db.Integer, primary_key=True)
 
-    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
+    user_id = db.Column(
+        db.Integer, db.ForeignKey("users.id", ondelete="CASCADE"), nullable=False
+    )
     aktie_id = db.Column(db.Integer, db.ForeignKey("aktien.id"), nullable=False)
 
     user = db.relationship("User", back_populates="watchlist_entries")
@@ -206,13 +313,22 @@ class Chatverlauf(db.Model):
     # foreignId = id von Portfolio oder Aktie (abh. von type)
     foreign_id = db.Column(db.Integer, nullable=False)
 
-    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
+    user_id = db.Column(
+        db.Integer, db.ForeignKey("users.id", ondelete="CASCADE"), nullable=False
+    )
     user = db.relationship("User", back_populates="chats")
 
     entries = db.relationship(
         "ChatEntry",
         back_populates="chat",
         cascade="all, delete-orphan",
+        passive_deletes=True,
+    )
+    archived_entries = db.relationship(
+        "ChatEntryArchive",
+        back_populates="chat",
+        cascade="all, delete-orphan",
+        passive_deletes=True,
     )
 
     def to_dict(self):
@@ -228,6 +344,12 @@ class Chatverlauf(db.Model):
 
 class ChatEntry(db.Model):
     __tablename__ = "chat_entries"
+    __table_args__ = (
+        # Cursor-Pagination / Delta-Abfragen: WHERE chat_id = ? ORDER BY datetime, id
+        db.Index("ix_chat_entries_chat_id_datetime_id", "chat_id", "datetime", "id"),
+        # Archivierung: WHERE datetime < Stichtag
+        db.Index("ix_chat_entries_datetime", "datetime"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
 
@@ -235,7 +357,9 @@ class ChatEntry(db.Model):
     text = db.Column(db.Text, nullable=False)
     datetime = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
 
-    chat_id = db.Column(db.Integer, db.ForeignKey("chatverlauf.id"), nullable=False)
+    chat_id = db.Column(
+        db.Integer, db.ForeignKey("chatverlauf.id", ondelete="CASCADE"), nullable=False
+    )
     chat = db.relationship("Chatverlauf", back_populates="entries")
 
     def to_dict(self):
@@ -246,3 +370,64 @@ class ChatEntry(db.Model):
             "datetime": self.datetime.isoformat(),
             "chat_id": self.chat_id,
         }
+
+
+# ----- ChatEntry-Archiv -----
+
+class ChatEntryArchive(db.Model):
+    """
+    Ältere Chat-Einträge (siehe archive.py / `flask archive-chats`), mit
+    unveränderter id. Die heißen Abfragen (Chatbot-Kontext, neueste Seite,
+    Delta) lesen nur chat_entries; ältere Seiten der Pagination gehen hier weiter.
+    """
+
+    __tablename__ = "chat_entries_archive"
+    __table_args__ = (
+        db.Index("ix_chat_entries_archive_chat_id_datetime_id", "chat_id", "datetime", "id"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+
+    sender = db.Column(SAEnum(SenderEnum, name="sender_enum"), nullable=False)
+    text = db.Column(db.Text, nullable=False)
+    datetime = db.Column(db.DateTime, nullable=False)
+
+    chat_id = db.Column(
+        db.Integer, db.ForeignKey("chatverlauf.id", ondelete="CASCADE"), nullable=False
+    )
+    chat = db.relationship("Chatverlauf", back_populates="archived_entries")
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "sender": self.sender.value,
+            "text": self.text,
+            "datetime": self.datetime.isoformat(),
+            "chat_id": self.chat_id,
+        }
+
+
+# ----- Nachträglich hinzugekommene Indizes -----
+
+# db.create_all() legt Indizes nur zusammen mit neuen Tabellen an. Indizes, die
+# später zu bestehenden Tabellen dazukamen, zieht ensure_indexes() beim
+# App-Start auf Bestands-DBs nach (idempotent). Geänderte Fremdschlüssel
+# (ON DELETE CASCADE) werden dagegen nicht nachgezogen; deletion.py löscht
+# deshalb explizit Kinder vor Eltern und braucht sie nicht.
+LATE_INDEXES = (
+    "ix_chat_entries_chat_id_datetime_id",
+    "ix_chat_entries_datetime",
+)
+
+
+def ensure_indexes():
+    from flask import current_app
+    from sqlalchemy.exc import SQLAlchemyError
+
+    indexes = {index.name: index for table in db.metadata.tables.values() for index in table.indexes}
+    for name in LATE_INDEXES:
+        try:
+            indexes[name].create(db.engine, checkfirst=True)
+        except SQLAlchemyError:
+            # z.B. parallel von einem anderen Worker angelegt
+            current_app.logger.warning("Index %s nicht angelegt", name, exc_info=True)
@@ -0,0 +1,179 @@
+"""
+Materialisierte Positionen (Tabelle `positions`).
+
+Portfolio-Ansichten (Risiko, Chatbot-Kontext, /portfolios/<id>/positions)
+lesen den Bestand direkt aus `positions` statt alle Transaktionen zu
+aggregieren, der Aufwand wächst also mit der Zahl der Positionen.
+
+Die Transaktions-Routen schreiben die Positionen in derselben DB-Transaktion
+fort (add_transaction / remove_transaction, vor dem Commit). Die Deltas werden
+als `menge = menge + :delta` an die DB gegeben, damit parallele Requests sich
+nicht gegenseitig überschreiben. rebuild_positions baut die Tabelle aus den
+Transaktionen neu auf bzw. prüft sie (`flask rebuild-positions --check`).
+"""
+import math
+from decimal import Decimal
+
+from sqlalchemy import case, func, or_, select, update
+from sqlalchemy.exc import IntegrityError
+
+from .models import db, Aktie, Position, Transaktion
+
+
+def _decimal(value) -> Decimal:
+    return value if isinstance(value, Decimal) else Decimal(str(value))
+
+
+def _apply_delta(portfolio_id: int, aktie_id: int, menge, einstandswert, count: int, kaufdatum=None):
+    values = {
+        "menge": Position.menge + menge,
+        "einstandswert": Position.einstandswert + einstandswert,
+        "anzahl_transaktionen": Position.anzahl_transaktionen + count,
+    }
+    if kaufdatum is not None:
+        values["letztes_kaufdatum"] = case(
+            (or_(Position.letztes_kaufdatum.is_(None), Position.letztes_kaufdatum < kaufdatum), kaufdatum),
+            else_=Position.letztes_kaufdatum,
+        )
+    result = db.session.execute(
+        update(Position)
+        .where(Position.portfolio_id == portfolio_id, Position.aktie_id == aktie_id)
+        .values(**values)
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount
+
+
+def add_transaction(tx):
+    """Nimmt eine neue (bzw. geänderte) Transaktion in ihre Position auf."""
+    menge = _decimal(tx.menge)
+    einstandswert = menge * _decimal(tx.kaufpreis)
+
+    if _apply_delta(tx.portfolio_id, tx.aktie_id, menge, einstandswert, 1, tx.kaufdatum):
+        return
+
+    try:
+        # Savepoint: legt ein paralleler Request die Position zeitgleich an,
+        # greift der Unique-Constraint und es wird stattdessen aktualisiert
+        with db.session.begin_nested():
+            db.session.add(Position(
+                portfolio_id=tx.portfolio_id,
+                aktie_id=tx.aktie_id,
+                menge=menge,
+                einstandswert=einstandswert,
+                letztes_kaufdatum=tx.kaufdatum,
+                anzahl_transaktionen=1,
+            ))
+    except IntegrityError:
+        _apply_delta(tx.portfolio_id, tx.aktie_id, menge, einstandswert, 1, tx.kaufdatum)
+
+
+def remove_transaction(tx):
+    """
+    Nimmt eine Transaktion mit ihren aktuellen (alten) Werten aus ihrer
+    Position heraus. Muss vor dem Ändern bzw. Löschen der Transaktion
+    aufgerufen werden.
+    """
+    menge = _decimal(tx.menge)
+    _apply_delta(tx.portfolio_id, tx.aktie_id, -menge, -menge * _decimal(tx.kaufpreis), -1)
+
+    position = db.session.execute(
+        select(Position)
+        .where(Position.portfolio_id == tx.portfolio_id, Position.aktie_id == tx.aktie_id)
+        .execution_options(populate_existing=True)
+    ).scalar_one_or_none()
+    if position is None:
+        return
+
+    if position.anzahl_transaktionen <= 0:
+        db.session.delete(position)
+    elif position.letztes_kaufdatum == tx.kaufdatum:
+        # Das letzte Kaufdatum lässt sich nicht zurückrechnen -> über den Index nachsehen
+        position.letztes_kaufdatum = (
+            db.session.query(func.max(Transaktion.kaufdatum))
+            .filter(
+                Transaktion.portfolio_id == tx.portfolio_id,
+                Transaktion.aktie_id == tx.aktie_id,
+                Transaktion.id != tx.id,
+            )
+            .scalar()
+        )
+
+
+def open_positions(portfolio_id: int):
+    """[(Position, Aktie)] aller Positionen mit Bestand > 0."""
+    return (
+        db.session.query(Position, Aktie)
+        .join(Aktie, Aktie.id == Position.aktie_id)
+        .filter(Position.portfolio_id == portfolio_id, Position.menge > 0)
+        .order_by(Aktie.name)
+        .all()
+    )
+
+
+def _expected_positions(portfolio_id=None):
+    query = db.session.query(
+        Transaktion.portfolio_id,
+        Transaktion.aktie_id,
+        func.sum(Transaktion.menge),
+        func.sum(Transaktion.menge * Transaktion.kaufpreis),
+        func.max(Transaktion.kaufdatum),
+        func.count(Transaktion.id),
+    ).group_by(Transaktion.portfolio_id, Transaktion.aktie_id)
+    if portfolio_id is not None:
+        query = query.filter(Transaktion.portfolio_id == portfolio_id)
+    return {
+        (pid, aid): {
+            "menge": _decimal(menge),
+            "einstandswert": _decimal(einstandswert),
+            "letztes_kaufdatum": kaufdatum,
+            "anzahl_transaktionen": count,
+        }
+        for pid, aid, menge, einstandswert, kaufdatum, count in query
+    }
+
+
+def _matches(position, expected) -> bool:
+    return (
+        math.isclose(float(position.menge), float(expected["menge"]), rel_tol=1e-9, abs_tol=1e-6)
+        and math.isclose(float(position.einstandswert), float(expected["einstandswert"]), rel_tol=1e-9, abs_tol=1e-4)
+        and position.letztes_kaufdatum == expected["letztes_kaufdatum"]
+        and position.anzahl_transaktionen == expected["anzahl_transaktionen"]
+    )
+
+
+def rebuild_positions(portfolio_id=None, dry_run: bool = False) -> dict:
+    """
+    Gleicht `positions` mit den Transaktionen ab (alle oder ein Portfolio).
+    Liefert die Abweichungen {"missing", "stale", "orphaned"} als Listen von
+    (portfolio_id, aktie_id); ohne dry_run werden sie korrigiert und committet.
+    """
+    expected = _expected_positions(portfolio_id)
+
+    query = Position.query
+    if portfolio_id is not None:
+        query = query.filter_by(portfolio_id=portfolio_id)
+    actual = {(p.portfolio_id, p.aktie_id): p for p in query}
+
+    report = {"missing": [], "stale": [], "orphaned": []}
+    for key, values in expected.items():
+        position = actual.get(key)
+        if position is None:
+            report["missing"].append(key)
+            if not dry_run:
+                db.session.add(Position(portfolio_id=key[0], aktie_id=key[1], **values))
+        elif not _matches(position, values):
+            report["stale"].append(key)
+            if not dry_run:
+                for field, value in values.items():
+                    setattr(position, field, value)
+
+    for key, position in actual.items():
+        if key not in expected:
+            report["orphaned"].append(key)
+            if not dry_run:
+                db.session.delete(position)
+
+    if not dry_run:
+        db.session.commit()
+    return report
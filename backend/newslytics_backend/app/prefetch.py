@@ -0,0 +1,151 @@
+"""
+Prefetch-Worker: hält den geteilten Market-Data-Store (store.py) aktuell,
+damit Request-Handler im Normalfall nur noch aus Caches lesen.
+
+Gestartet als eigener Prozess (`flask prefetch`), läuft nach Zeitplan:
+- trending:  Trending-Listen je Region (PREFETCH_TRENDING_REGIONS)
+- quotes:    Quotes aller Symbole, die in Aktien (und damit Watchlists und
+             Transaktionen) vorkommen, gebündelt zu je MAX_BATCH_SYMBOLS
+- histories: alle gespeicherten Tages-Reihen ab ihrem letzten Bar fortschreiben
+
+Alle Upstream-Aufrufe gehen wie in den Web-Workern über Rate-Limit und
+Circuit-Breaker (upstream.py). Fehlschlagende Batches bzw. Symbole werden
+geloggt und übersprungen, der Rest des Laufs geht weiter; ein fehlschlagender
+Job wird beim nächsten Termin erneut versucht.
+"""
+import time
+from collections import defaultdict
+
+from flask import current_app
+
+from . import market
+from .models import db, Aktie
+from .store import STORE_INTERVALS, covering_period, period_start, save_bars, stored_series, write_entries
+
+
+def refresh_trending(regions):
+    now = market._now_utc()
+    refreshed = 0
+    for region in regions:
+        try:
+            payload = market.load_trending(region)
+        except LookupError:
+            continue
+        # Etwas länger gültig als der Abstand der Läufe, damit keine Lücke entsteht
+        market.store_trending(region, payload, now, 2 * current_app.config["PREFETCH_TRENDING_INTERVAL"])
+        refreshed += 1
+    return refreshed
+
+
+def referenced_symbols():
+    """Ticker aller Aktien (Watchlist- und Transaktions-Einträge verweisen auf diese)."""
+    isins = [isin for (isin,) in db.session.query(Aktie.isin).distinct()]
+    return sorted({ticker for ticker in map(market.resolve_ticker, isins) if ticker})
+
+
+def refresh_quotes():
+    interval = current_app.config["PREFETCH_QUOTES_INTERVAL"]
+    symbols = referenced_symbols()
+    refreshed = 0
+    for i in range(0, len(symbols), market.MAX_BATCH_SYMBOLS):
+        chunk = symbols[i:i + market.MAX_BATCH_SYMBOLS]
+        now = market._now_utc()
+        try:
+            quotes = market._fetch_quotes(chunk)
+        except Exception:
+            current_app.logger.exception("prefetch quotes: Batch ab %s fehlgeschlagen", chunk[0])
+            continue
+        for symbol, quote in quotes.items():
+            market._store_quote(symbol, quote, now, 2 * interval)
+        write_entries({f"quote:{symbol}": quote for symbol, quote in quotes.items()}, 2 * interval, now)
+        refreshed += len(quotes)
+    return refreshed
+
+
+def extend_histories():
+    """
+    Lädt für jede gespeicherte Reihe nur den Zeitraum ab ihrem letzten Bar
+    nach (gebündelt pro nötigem Zeitraum). Haben sich ältere Kurse rückwirkend
+    geändert, wird die Reihe über ihren ganzen Zeitraum neu geladen.
+    """
+    now = market._now_utc()
+    extended = 0
+    for interval in STORE_INTERVALS:
+        by_period = defaultdict(list)
+        covered = {}
+        for symbol, covered_from, last_ts in stored_series(interval):
+            by_period[covering_period(last_ts, now)].append(symbol)
+            covered[symbol] = covered_from
+
+        reload = defaultdict(list)
+        for period, symbols in by_period.items():
+            for symbol, hist in _download_chunks(symbols, period, interval):
+                try:
+                    saved = save_bars(symbol, interval, hist, period_start(period, now) or now, now)
+                except Exception:
+                    current_app.logger.exception("prefetch histories: %s nicht gespeichert", symbol)
+                    continue
+                if saved:
+                    extended += 1
+                else:
+                    reload[covering_period(covered[symbol], now)].append(symbol)
+
+        for period, symbols in reload.items():
+            for symbol, hist in _download_chunks(symbols, period, interval):
+                try:
+                    save_bars(symbol, interval, hist, period_start(period, now) or now, now)
+                except Exception:
+                    current_app.logger.exception("prefetch histories: %s nicht gespeichert", symbol)
+                    continue
+                extended += 1
+    return extended
+
+
+def _download_chunks(symbols, period: str, interval: str):
+    """(symbol, DataFrame) je MAX_BATCH_SYMBOLS-Batch; ein fehlschlagender Batch wird geloggt und übersprungen."""
+    for i in range(0, len(symbols), market.MAX_BATCH_SYMBOLS):
+        chunk = symbols[i:i + market.MAX_BATCH_SYMBOLS]
+        try:
+            downloaded = market._download_history(chunk, period, interval)
+        except Exception:
+            current_app.logger.exception("prefetch histories: Batch ab %s (%s) fehlgeschlagen", chunk[0], period)
+            continue
+        yield from downloaded.items()
+
+
+class PrefetchWorker:
+    """Einfacher Scheduler: jeder Job läuft in seinem Intervall, nacheinander in einem Thread."""
+
+    def __init__(self, app, job_names=None):
+        config = app.config
+        regions = [r.strip() for r in config["PREFETCH_TRENDING_REGIONS"].split(",") if r.strip()]
+        jobs = {
+            "trending": (config["PREFETCH_TRENDING_INTERVAL"], lambda: refresh_trending(regions)),
+            "quotes": (config["PREFETCH_QUOTES_INTERVAL"], refresh_quotes),
+            "histories": (config["PREFETCH_HISTORY_INTERVAL"], extend_histories),
+        }
+        self.app = app
+        self.jobs = {name: jobs[name] for name in (job_names or jobs)}
+        self.next_run = {name: 0.0 for name in self.jobs}
+
+    def run_job(self, name: str):
+        interval, fn = self.jobs[name]
+        started = time.monotonic()
+        with self.app.app_context():
+            try:
+                result = fn()
+                self.app.logger.info("prefetch %s: %s (%.1f s)", name, result, time.monotonic() - started)
+            except Exception:
+                self.app.logger.exception("prefetch %s fehlgeschlagen", name)
+            finally:
+                db.session.remove()
+        self.next_run[name] = started + interval
+
+    def run(self, once: bool = False):
+        while True:
+            for name in self.jobs:
+                if once or self.next_run[name] <= time.monotonic():
+                    self.run_job(name)
+            if once:
+                return
+            time.sleep(max(0.0, min(self.next_run.values()) - time.monotonic()))
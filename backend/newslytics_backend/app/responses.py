@@ -0,0 +1,181 @@
+"""
+JSON-Serialisierung, Response-Kompression und ETags.
+
+- OrjsonProvider: schnellerer JSON-Encoder für Flask (orjson, falls installiert)
+- make_cache_entry / cached_json_response: Cache-Einträge halten die fertig
+  serialisierten Bytes + ETag, damit Treffer weder neu kodiert noch (bei
+  passendem If-None-Match) überhaupt übertragen werden müssen
+- compress_response: gzip/brotli für große Antworten (after_request-Hook)
+"""
+import gzip
+import hashlib
+import json
+from datetime import timedelta
+
+from flask import Response, current_app, request
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # optional
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # optional
+    brotli = None
+
+
+COMPRESSIBLE_MIMETYPES = ("application/json", "text/plain", "text/html", "text/csv")
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """
+    JSON-Provider auf Basis von orjson.
+    Fällt auf den Standard-Encoder zurück, wenn orjson fehlt oder einen Typ
+    nicht serialisieren kann. datetime/dataclass-Objekte laufen weiter über
+    DefaultJSONProvider.default, damit sich das Format nicht ändert.
+    """
+
+    def _orjson_options(self):
+        options = (
+            orjson.OPT_NON_STR_KEYS
+            | orjson.OPT_PASSTHROUGH_DATETIME
+            | orjson.OPT_PASSTHROUGH_DATACLASS
+        )
+        if self.sort_keys:
+            options |= orjson.OPT_SORT_KEYS
+        if (self.compact is None and self._app.debug) or self.compact is False:
+            options |= orjson.OPT_INDENT_2
+        return options
+
+    def dumps_bytes(self, obj, **kwargs) -> bytes:
+        if orjson is not None and not kwargs:
+            try:
+                return orjson.dumps(obj, default=self.default, option=self._orjson_options())
+            except (TypeError, orjson.JSONEncodeError):
+                pass
+        return super().dumps(obj, **kwargs).encode("utf-8")
+
+    def dumps(self, obj, **kwargs) -> str:
+        return self.dumps_bytes(obj, **kwargs).decode("utf-8")
+
+    def loads(self, s, **kwargs):
+        if orjson is not None and not kwargs:
+            try:
+                return orjson.loads(s)
+            except orjson.JSONDecodeError:
+                pass
+        return super().loads(s, **kwargs)
+
+    def response(self, *args, **kwargs) -> Response:
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(
+            self.dumps_bytes(obj) + b"\n", mimetype=self.mimetype
+        )
+
+
+def json_bytes(payload) -> bytes:
+    """Serialisiert payload mit dem JSON-Provider der App zu Bytes."""
+    provider = current_app.json
+    if hasattr(provider, "dumps_bytes"):
+        return provider.dumps_bytes(payload)
+    return json.dumps(payload).encode("utf-8")
+
+
+def make_cache_entry(payload, ttl_seconds: int, now, **extra):
+    """
+    Baut einen Cache-Eintrag im üblichen Format ({"expires_at", "payload"})
+    und legt die serialisierten Bytes + starken ETag direkt daneben ab.
+    """
+    body = json_bytes(payload)
+    entry = {
+        "expires_at": now + timedelta(seconds=ttl_seconds),
+        "payload": payload,
+        "body": body,
+        "etag": hashlib.sha1(body).hexdigest(),
+    }
+    entry.update(extra)
+    return entry
+
+
+def _accepted_encoding():
+    accept = request.accept_encodings
+    if brotli is not None and accept["br"]:
+        return "br"
+    if accept["gzip"]:
+        return "gzip"
+    return None
+
+
+def _encode(body: bytes, encoding: str) -> bytes:
+    level = current_app.config["COMPRESS_LEVEL"]
+    if encoding == "br":
+        return brotli.compress(body, quality=min(level, 11))
+    return gzip.compress(body, compresslevel=level)
+
+
+def cached_json_response(entry, status: int = 200) -> Response:
+    """
+    Antwortet aus einem Cache-Eintrag von make_cache_entry.
+    - If-None-Match passt -> 304 ohne Body
+    - sonst die gespeicherten Bytes, ggf. komprimiert (komprimierte Variante
+      wird ebenfalls im Eintrag gemerkt)
+    """
+    body = entry["body"]
+    encoding = None
+    if len(body) >= current_app.config["COMPRESS_MIN_SIZE"]:
+        encoding = _accepted_encoding()
+
+    # Starker ETag pro Repräsentation (identity / gzip / br)
+    etag = entry["etag"] if encoding is None else f"{entry['etag']}-{encoding}"
+
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        if encoding is not None:
+            encoded = entry.setdefault("encoded", {})
+            if encoding not in encoded:
+                encoded[encoding] = _encode(body, encoding)
+            body = encoded[encoding]
+        response = Response(body, status=status, mimetype="application/json")
+        if encoding is not None:
+            response.headers["Content-Encoding"] = encoding
+
+    response.set_etag(etag)
+    response.vary.add("Accept-Encoding")
+    return response
+
+
+def compress_response(response: Response) -> Response:
+    """
+    after_request-Hook: komprimiert große Antworten, die noch nicht
+    komprimiert sind (z.B. normale jsonify-Antworten).
+    """
+    if (
+        response.status_code != 200
+        or response.direct_passthrough
+        or response.is_streamed
+        or "Content-Encoding" in response.headers
+        or response.mimetype not in COMPRESSIBLE_MIMETYPES
+    ):
+        return response
+
+    body = response.get_data()
+    if len(body) < current_app.config["COMPRESS_MIN_SIZE"]:
+        return response
+
+    encoding = _accepted_encoding()
+    if encoding is None:
+        return response
+
+    response.set_data(_encode(body, encoding))
+    response.headers["Content-Encoding"] = encoding
+    response.vary.add("Accept-Encoding")
+
+    # Ein vorhandener ETag gilt nur für die unkomprimierte Variante
+    etag, weak = response.get_etag()
+    if etag:
+        response.set_etag(f"{etag}-{encoding}", weak=weak)
+
+    return response
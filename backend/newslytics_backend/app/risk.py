@@ -0,0 +1,77 @@
+"""
+Risiko-Kennzahlen eines Portfolios aus gecachten Tagesrenditen.
+
+Alle Positionen werden gemeinsam als Matrix gerechnet (NumPy):
+- Kovarianzmatrix der Tagesrenditen (annualisiert)
+- Portfolio-Volatilität  sigma_p = sqrt(w' * Cov * w)
+- Beta gegen eine Benchmark (Portfolio und je Position)
+- Risikobeitrag je Position  w_i * (Cov * w)_i / sigma_p  (Summe = sigma_p)
+"""
+import math
+
+TRADING_DAYS_PER_YEAR = 252
+
+RISK_CACHE = {}  # Key: (portfolio_id, benchmark, period) -> Cache-Eintrag + "signature"
+
+
+def _to_float(value):
+    return None if value is None or value != value else float(value)
+
+
+def compute_risk(holdings, aligned, benchmark: str):
+    """
+    holdings: [{"aktie_id", "ticker", "menge"}] (nur Positionen mit Kursdaten)
+    aligned:  Ergebnis von market.align_closes (Schlusskurse auf gemeinsamem Index,
+              inkl. Benchmark)
+    """
+    import numpy as np
+
+    tickers = [h["ticker"] for h in holdings]
+    closes = np.array([aligned["series"][t] for t in tickers], dtype=float).T  # (T, N)
+    bench_closes = np.array(aligned["series"][benchmark], dtype=float)
+
+    returns = closes[1:] / closes[:-1] - 1
+    bench_returns = bench_closes[1:] / bench_closes[:-1] - 1
+
+    quantities = np.array([h["menge"] for h in holdings], dtype=float)
+    market_values = quantities * closes[-1]
+    total_value = market_values.sum()
+    weights = market_values / total_value if total_value else np.zeros_like(market_values)
+
+    cov = np.atleast_2d(np.cov(returns, rowvar=False)) * TRADING_DAYS_PER_YEAR
+    portfolio_var = float(weights @ cov @ weights)
+    portfolio_vol = math.sqrt(portfolio_var) if portfolio_var > 0 else 0.0
+    contributions = weights * (cov @ weights) / portfolio_vol if portfolio_vol else np.zeros_like(weights)
+
+    bench_var = bench_returns.var(ddof=1) * TRADING_DAYS_PER_YEAR
+    # Kovarianz jeder Position mit der Benchmark in einem Schritt
+    centered = returns - returns.mean(axis=0)
+    bench_centered = bench_returns - bench_returns.mean()
+    cov_with_bench = centered.T @ bench_centered / (len(bench_returns) - 1) * TRADING_DAYS_PER_YEAR
+    betas = cov_with_bench / bench_var if bench_var else np.full(len(tickers), np.nan)
+
+    positions = []
+    for i, holding in enumerate(holdings):
+        positions.append({
+            **holding,
+            "market_value": _to_float(market_values[i]),
+            "weight": _to_float(weights[i]),
+            "volatility": _to_float(math.sqrt(cov[i, i])),
+            "beta": _to_float(betas[i]),
+            "risk_contribution": _to_float(contributions[i]),
+            "risk_contribution_pct": _to_float(contributions[i] / portfolio_vol) if portfolio_vol else None,
+        })
+
+    return {
+        "observations": int(len(returns)),
+        "portfolio": {
+            "market_value": _to_float(total_value),
+            "volatility": portfolio_vol,
+            "beta": _to_float(weights @ betas),
+        },
+        "positions": positions,
+        "covariance": {
+            "symbols": tickers,
+            "matrix": [[_to_float(v) for v in row] for row in cov.tolist()],
+        },
+    }
@@ -1,8 +1,6 @@
-from datetime import date, datetime, timedelta
+from datetime import date, datetime
 from flask import Blueprint, request, jsonify, abort
-from sqlalchemy import or_
-import requests
-import yfinance as yf
+from sqlalchemy import and_, or_
 
 from .models import (
     db,
@@ -11,64 +9,37 @@ from .models import (
     Aktie,
     Watchlist,
     Transaktion,
+    Position,
     Chatverlauf,
     ChatEntry,
+    ChatEntryArchive,
     ChatTypeEnum,
     SenderEnum,
 )
-
-from werkzeug.security import generate_password_hash, check_password_hash
+from .chat_context import build_chat_context, invalidate as invalidate_chat_context
+from .chatbot import build_stock_context, get_generator, persist_message, stream_reply_response
+from .deletion import delete_chat, delete_portfolio, delete_user
+from .identity import invalidate_identity
+from .market import align_closes, get_histories_cached, get_quotes_cached, resolve_ticker
+from .positions import add_transaction, open_positions, remove_transaction
+from .responses import make_cache_entry, cached_json_response
+from .risk import RISK_CACHE, compute_risk
+from .upstream import UpstreamUnavailable
+
+from .security import hash_password, needs_rehash, verify_password
 from flask_jwt_extended import (
 
     create_access_token,
     jwt_required,
     get_jwt_identity,
+    verify_jwt_in_request,
+    current_user,
 )
 
 api_bp = Blueprint("api", __name__)
 
-# ------- Simple In-Memory Caches -------
-
-# Kursdaten-Caching (historische Marketdata)
-MARKETDATA_CACHE = {}  # Key: (symbol, period, interval) -> {"expires_at": datetime, "payload": dict}
-
-# Company-/Ticker-Info-Caching (inkl. ISIN etc.)
-COMPANYINFO_CACHE = {}  # Key: symbol -> {"expires_at": datetime, "info": dict}
-
-# Trending-Listen-Caching
-TRENDING_CACHE = {}  # Key: region -> {"expires_at": datetime, "quotes": list}
-
-
-def _now_utc():
-    return datetime.utcnow()
-
-
-def get_company_info_cached(symbol: str, ttl_seconds: int = 3600):
-    """
-    Holt Company-Info aus Cache oder via yfinance.Ticker.
-    Wird von /companyinfo, /aktie/search und /aktie/trending verwendet.
-    """
-    now = _now_utc()
-    entry = COMPANYINFO_CACHE.get(symbol)
-    if entry and entry["expires_at"] > now:
-        return entry["info"]
-
-    # Neu von yfinance holen
-    ticker = yf.Ticker(symbol)
-
-    info = {}
-    if hasattr(ticker, "info") and isinstance(ticker.info, dict):
-        info = ticker.info or {}
-    else:
-        basic = getattr(ticker, "basic_info", {}) or {}
-        fast = getattr(ticker, "fast_info", {}) or {}
-        info = {**basic, **fast}
-
-    COMPANYINFO_CACHE[symbol] = {
-        "info": info,
-        "expires_at": now + timedelta(seconds=ttl_seconds),
-    }
-    return info
+# Aktien-Liste (GET /aktien) fertig serialisiert cachen, wird bei Änderungen geleert
+AKTIEN_CACHE = {}  # Key: "all" -> {"expires_at": datetime, "payload": list, "body": bytes, "etag": str}
 
 # ------- Helper -------
 
@@ -77,6 +48,23 @@ def get_json():
         abort(400, description="Request must be JSON")
     return request.get_json()
 
+
+def _owns_portfolio(portfolio_id) -> bool:
+    """
+    Ownership-Check über den Identity-Cache (ohne Query).
+    Nur wenn das Portfolio dort fehlt (z.B. in einem anderen Worker angelegt),
+    wird einmal in der DB nachgesehen und der Cache erneuert. 404, falls es
+    das Portfolio nicht gibt.
+    """
+    if current_user.owns_portfolio(portfolio_id):
+        return True
+
+    portfolio = Portfolio.query.get_or_404(portfolio_id)
+    if portfolio.user_id != current_user.user_id:
+        return False
+    invalidate_identity(current_user.user_id)
+    return True
+
 # ======================
 #        Auth (LOGIN Register)
 # ======================
@@ -99,7 +87,7 @@ def register():
         lastname=data["lastname"],
     )
 
-    user.password = generate_password_hash(data["password"])
+    user.password = hash_password(data["password"])
 
     db.session.add(user)
     db.session.commit()
@@ -118,11 +106,16 @@ def login():
     if user is None:
         abort(401, description="Invalid credentials")
 
-    # Passwort prüfen
-    if not check_password_hash(user.password, data["password"]):
+    # Passwort prüfen (im Hash-Prozess-Pool)
+    if not verify_password(user.password, data["password"]):
         # oder: if not user.check_password(data["password"]):
         abort(401, description="Invalid credentials")
 
+    # Hash mit veralteten Parametern (PASSWORD_HASH_METHOD geändert) transparent erneuern
+    if needs_rehash(user.password):
+        user.password = hash_password(data["password"])
+        db.session.commit()
+
     # JWT generieren, Identity = user.id
     access_token = create_access_token(identity=str(user.id))
 
@@ -135,9 +128,66 @@ def login():
 @api_bp.route("/auth/me", methods=["GET"])
 @jwt_required()
 def me():
-    current_user_id = int(get_jwt_identity())
-    user = User.query.get_or_404(current_user_id)
-    return jsonify(user.to_dict()), 200
+    # Aus dem Identity-Cache (beim Token-Check geladen), keine DB-Query
+    return jsonify(current_user.user), 200
+
+
+# ======================
+#       DASHBOARD
+# ======================
+
+@api_bp.route("/dashboard", methods=["GET"])
+@jwt_required()
+def dashboard():
+    """
+    Alles, was das Frontend nach dem Login braucht, in einem Aufruf:
+    User, Portfolios inkl. Transaktionen und Positionen, Watchlist und alle
+    referenzierten Aktien.
+    Feste Anzahl Queries (unabhängig von der Zahl der Portfolios), mit ETag -> 304.
+    """
+    user_id = current_user.user_id
+
+    portfolios = Portfolio.query.filter_by(user_id=user_id).all()
+    portfolio_ids = [p.id for p in portfolios]
+
+    txs = []
+    positions = []
+    if portfolio_ids:
+        txs = Transaktion.query.filter(Transaktion.portfolio_id.in_(portfolio_ids)).all()
+        positions = Position.query.filter(
+            Position.portfolio_id.in_(portfolio_ids), Position.menge > 0
+        ).all()
+
+    watchlist = Watchlist.query.filter_by(user_id=user_id).all()
+
+    aktie_ids = {t.aktie_id for t in txs} | {w.aktie_id for w in watchlist}
+    aktien = []
+    if aktie_ids:
+        aktien = Aktie.query.filter(Aktie.id.in_(aktie_ids)).all()
+
+    txs_by_portfolio = {pid: [] for pid in portfolio_ids}
+    for tx in txs:
+        txs_by_portfolio[tx.portfolio_id].append(tx.to_dict())
+    positions_by_portfolio = {pid: [] for pid in portfolio_ids}
+    for position in positions:
+        positions_by_portfolio[position.portfolio_id].append(position.to_dict())
+
+    payload = {
+        "user": current_user.user,
+        "portfolios": [
+            {
+                **p.to_dict(),
+                "transaktionen": txs_by_portfolio[p.id],
+                "positionen": positions_by_portfolio[p.id],
+            }
+            for p in portfolios
+        ],
+        "watchlist": [w.to_dict() for w in watchlist],
+        "aktien": [a.to_dict() for a in aktien],
+    }
+
+    # Nicht gecacht (TTL 0) – der Eintrag liefert nur Bytes + ETag für 304/Kompression
+    return cached_json_response(make_cache_entry(payload, 0, datetime.utcnow()))
 
 
 # ======================
@@ -153,8 +203,8 @@ def users_collection():
             firstname=data["firstname"],
             lastname=data["lastname"],
         )
-        # Passwort hashen:
-        user.password = generate_password_hash(data["password"])
+        # Passwort hashen (im Hash-Prozess-Pool):
+        user.password = hash_password(data["password"])
         # oder: user.set_password(data["password"])
 
         db.session.add(user)
@@ -174,9 +224,12 @@ def user_detail(user_id):
     if request.method == "GET":
         return jsonify(user.to_dict())
 
-    # DELETE
-    db.session.delete(user)
+    # DELETE (Bulk-SQL, ohne Portfolios/Transaktionen/Chats zu laden)
+    chat_ids = delete_user(user_id)
     db.session.commit()
+    invalidate_identity(user_id)
+    for chat_id in chat_ids:
+        invalidate_chat_context(chat_id)
     return jsonify({"message": f"User {user_id} deleted"}), 200
 
 
@@ -195,6 +248,7 @@ def portfolios_collection():
         )
         db.session.add(portfolio)
         db.session.commit()
+        invalidate_identity(portfolio.user_id)
         return jsonify(portfolio.to_dict()), 201
 
     portfolios = Portfolio.query.all()
@@ -205,14 +259,13 @@ def portfolios_collection():
 def update_portfolio(portfolio_id):
     data = get_json()
 
-    # Portfolio suchen
-    portfolio = Portfolio.query.get_or_404(portfolio_id)
-
     # Sicherstellen, dass der eingeloggte Benutzer nur seine eigenen Portfolios ändert
-    current_user_id = int(get_jwt_identity())
-    if portfolio.user_id != current_user_id:
+    if not _owns_portfolio(portfolio_id):
         return jsonify({"error": "Not authorized - Not your portfolio."}), 403
 
+    # Portfolio suchen
+    portfolio = Portfolio.query.get_or_404(portfolio_id)
+
     if "name" in data:
         portfolio.name = data["name"]
 
@@ -228,9 +281,13 @@ def portfolio_detail(portfolio_id):
     if request.method == "GET":
         return jsonify(portfolio.to_dict())
 
-    # DELETE
-    db.session.delete(portfolio)
+    # DELETE (Bulk-SQL inkl. Transaktionen, Positionen und Portfolio-Chats)
+    user_id = portfolio.user_id
+    chat_ids = delete_portfolio(portfolio_id)
     db.session.commit()
+    invalidate_identity(user_id)
+    for chat_id in chat_ids:
+        invalidate_chat_context(chat_id)
     return jsonify({"message": f"Portfolio {portfolio_id} deleted"}), 200
 
 
@@ -269,10 +326,16 @@ def aktien_collection():
         )
         db.session.add(aktie)
         db.session.commit()
+        AKTIEN_CACHE.clear()
         return jsonify(aktie.to_dict()), 201
 
-    aktien = Aktie.query.all()
-    return jsonify([a.to_dict() for a in aktien])
+    now = datetime.utcnow()
+    cache_entry = AKTIEN_CACHE.get("all")
+    if cache_entry is None or cache_entry["expires_at"] <= now:
+        aktien = Aktie.query.all()
+        cache_entry = make_cache_entry([a.to_dict() for a in aktien], 60, now)
+        AKTIEN_CACHE["all"] = cache_entry
+    return cached_json_response(cache_entry)
 
 @api_bp.route("/aktien/<int:aktie_id>", methods=["PUT"])
 @jwt_required()
@@ -309,6 +372,7 @@ def update_aktie(aktie_id):
         aktie.unternehmenswert = data["unternehmenswert"]
 
     db.session.commit()
+    AKTIEN_CACHE.clear()
 
     return jsonify(aktie.to_dict()), 200
 
@@ -323,6 +387,7 @@ def aktie_detail(aktie_id):
     # DELETE
     db.session.delete(aktie)
     db.session.commit()
+    AKTIEN_CACHE.clear()
     return jsonify({"message": f"Aktie {aktie_id} deleted"}), 200
 
 
@@ -366,6 +431,43 @@ def watchlist_of_user(user_id):
     return jsonify([e.to_dict() for e in entries])
 
 
+@api_bp.route("/watchlist/user/<int:user_id>/quotes", methods=["GET"])
+@jwt_required()
+def watchlist_quotes_of_user(user_id):
+    """
+    Watchlist eines Users inkl. Aktie und aktuellem Kurs in einem Aufruf:
+    - 1 Query (Watchlist JOIN Aktie)
+    - ISIN -> Ticker (gecacht)
+    - 1 gebündelter Kurs-Download für alle Symbole, die nicht im Quote-Cache sind
+    """
+    User.query.get_or_404(user_id)
+
+    rows = (
+        db.session.query(Watchlist, Aktie)
+        .join(Aktie, Watchlist.aktie_id == Aktie.id)
+        .filter(Watchlist.user_id == user_id)
+        .all()
+    )
+
+    tickers = {aktie.id: resolve_ticker(aktie.isin) for _, aktie in rows}
+    quotes = get_quotes_cached([t for t in tickers.values() if t])
+
+    result = []
+    for entry, aktie in rows:
+        ticker = tickers[aktie.id]
+        quote = quotes.get(ticker)
+        if quote is not None:
+            # Der gebündelte Kurs-Download liefert keine Währung -> aus der Aktie
+            quote = {**quote, "currency": aktie.currency}
+        result.append({
+            **entry.to_dict(),
+            "aktie": aktie.to_dict(),
+            "ticker": ticker,
+            "quote": quote,
+        })
+    return jsonify(result)
+
+
 # ======================
 #     TRANSAKTIONEN
 # ======================
@@ -386,6 +488,7 @@ def transaktionen_collection():
             portfolio_id=data["portfolio_id"],
         )
         db.session.add(tx)
+        add_transaction(tx)
         db.session.commit()
         return jsonify(tx.to_dict()), 201
 
@@ -401,9 +504,14 @@ def update_transaktion(tx_id):
     tx = Transaktion.query.get_or_404(tx_id)
 
     # Der User darf nur Transaktionen in seinen eigenen Portfolios bearbeiten
-    current_user_id = int(get_jwt_identity())
-    if tx.portfolio.user_id != current_user_id:
+    # (auch beim Verschieben in ein anderes Portfolio)
+    if not _owns_portfolio(tx.portfolio_id):
         return jsonify({"error": "Not authorized - Not your transaction."}), 403
+    if "portfolio_id" in data and not _owns_portfolio(data["portfolio_id"]):
+        return jsonify({"error": "Not authorized - Not your portfolio."}), 403
+
+    # Position mit den alten Werten verlassen, nach dem Update neu eintragen
+    remove_transaction(tx)
 
     # Felder aktualisieren, falls im Request enthalten
     if "menge" in data:
@@ -421,6 +529,7 @@ def update_transaktion(tx_id):
     if "portfolio_id" in data:
         tx.portfolio_id = data["portfolio_id"]
 
+    add_transaction(tx)
     db.session.commit()
 
     return jsonify(tx.to_dict()), 200
@@ -429,6 +538,7 @@ def update_transaktion(tx_id):
 @jwt_required()
 def transaktion_detail(tx_id):
     tx = Transaktion.query.get_or_404(tx_id)
+    remove_transaction(tx)
     db.session.delete(tx)
     db.session.commit()
     return jsonify({"message": f"Transaktion {tx_id} deleted"}), 200
@@ -444,6 +554,92 @@ def transaktionen_of_portfolio(portfolio_id):
     return jsonify([t.to_dict() for t in txs])
 
 
+@api_bp.route("/portfolios/<int:portfolio_id>/positions", methods=["GET"])
+@jwt_required()
+def positions_of_portfolio(portfolio_id):
+    """Offene Positionen (Bestand, Einstandswert, letztes Kaufdatum) aus der Positions-Tabelle."""
+    if not _owns_portfolio(portfolio_id):
+        return jsonify({"error": "Not authorized - Not your portfolio."}), 403
+
+    return jsonify([
+        {**position.to_dict(), "name": aktie.name, "isin": aktie.isin}
+        for position, aktie in open_positions(portfolio_id)
+    ])
+
+
+@api_bp.route("/portfolios/<int:portfolio_id>/risk", methods=["GET"])
+@jwt_required()
+def portfolio_risk(portfolio_id):
+    """
+    Risiko-Kennzahlen eines Portfolios: Kovarianzmatrix, Volatilität, Beta gegen
+    ?benchmark= (Standard ^GSPC) und Risikobeitrag je Position, aus gecachten
+    Tagesrenditen über ?range= (Standard 1y).
+    Gecacht, bis sich die Positionen oder der Handelstag ändern.
+    """
+    if not _owns_portfolio(portfolio_id):
+        return jsonify({"error": "Not authorized - Not your portfolio."}), 403
+
+    benchmark = request.args.get("benchmark", "^GSPC")
+    period = request.args.get("range", "1y")
+
+    holdings = [
+        {"aktie_id": aktie.id, "isin": aktie.isin, "menge": float(position.menge)}
+        for position, aktie in open_positions(portfolio_id)
+    ]
+    if not holdings:
+        abort(404, description=f"Portfolio {portfolio_id} has no open positions")
+
+    now = datetime.utcnow()
+    signature = (
+        tuple(sorted((h["aktie_id"], h["menge"]) for h in holdings)),
+        now.date().isoformat(),
+    )
+    cache_key = (portfolio_id, benchmark, period)
+    cache_entry = RISK_CACHE.get(cache_key)
+    if cache_entry and cache_entry["signature"] == signature:
+        return cached_json_response(cache_entry)
+
+    for holding in holdings:
+        holding["ticker"] = resolve_ticker(holding["isin"])
+    tickers = list(dict.fromkeys(h["ticker"] for h in holdings if h["ticker"]))
+
+    # Alle Kursreihen (inkl. Benchmark) gebündelt aus dem Cache bzw. einem Download
+    try:
+        entries = get_histories_cached(tickers + [benchmark], period, "1d")
+    except UpstreamUnavailable as e:
+        abort(503, description=f"Market data provider unavailable: {str(e)}")
+    except Exception as e:
+        abort(500, description=f"Error fetching market data: {str(e)}")
+
+    if benchmark not in entries:
+        abort(404, description=f"No market data found for benchmark '{benchmark}'.")
+
+    priced = [h for h in holdings if h["ticker"] in entries]
+    if not priced:
+        abort(404, description="No market data found for the portfolio positions.")
+
+    aligned = align_closes(
+        {symbol: entries[symbol] for symbol in [h["ticker"] for h in priced] + [benchmark]},
+        "1d",
+        "intersection",
+    )
+    if len(aligned["index"]) < 3:
+        abort(404, description="Not enough overlapping price history.")
+
+    payload = {
+        "portfolio_id": portfolio_id,
+        "benchmark": benchmark,
+        "range": period,
+        "as_of": aligned["index"][-1],
+        **compute_risk(priced, aligned, benchmark),
+        "missing": [h["aktie_id"] for h in holdings if h not in priced],
+    }
+
+    cache_entry = make_cache_entry(payload, 24 * 3600, now, signature=signature)
+    RISK_CACHE[cache_key] = cache_entry
+    return cached_json_response(cache_entry)
+
+
 # ======================
 #        CHATS
 # ======================
@@ -470,9 +666,10 @@ def chats_collection():
 @api_bp.route("/chats/<int:chat_id>", methods=["DELETE"])
 @jwt_required()
 def chat_detail(chat_id):
-    chat = Chatverlauf.query.get_or_404(chat_id)
-    db.session.delete(chat)
+    Chatverlauf.query.get_or_404(chat_id)
+    delete_chat(chat_id)
     db.session.commit()
+    invalidate_chat_context(chat_id)
     return jsonify({"message": f"Chat {chat_id} deleted"}), 200
 
 
@@ -480,6 +677,77 @@ def chat_detail(chat_id):
 #      CHAT ENTRIES
 # ======================
 
+CHAT_PAGE_DEFAULT_LIMIT = 50
+CHAT_PAGE_MAX_LIMIT = 200
+
+
+def _chat_page_limit():
+    limit = request.args.get("limit", CHAT_PAGE_DEFAULT_LIMIT, type=int)
+    return max(1, min(limit, CHAT_PAGE_MAX_LIMIT))
+
+
+def _chat_cursor(chat_id, entry_id):
+    """
+    Liefert (datetime, id, archived) des Cursor-Eintrags oder 404.
+    Sucht erst in chat_entries, dann im Archiv.
+    """
+    for model in (ChatEntry, ChatEntryArchive):
+        cursor_dt = (
+            db.session.query(model.datetime)
+            .filter_by(id=entry_id, chat_id=chat_id)
+            .scalar()
+        )
+        if cursor_dt is not None:
+            return cursor_dt, entry_id, model is ChatEntryArchive
+    abort(404, description=f"Chat entry {entry_id} not found in chat {chat_id}")
+
+
+def _chat_entries_before(model, cursor):
+    cursor_dt, cursor_id, _ = cursor
+    return or_(
+        model.datetime < cursor_dt,
+        and_(model.datetime == cursor_dt, model.id < cursor_id),
+    )
+
+
+def _chat_entries_after(model, cursor):
+    cursor_dt, cursor_id, _ = cursor
+    return or_(
+        model.datetime > cursor_dt,
+        and_(model.datetime == cursor_dt, model.id > cursor_id),
+    )
+
+
+def _chat_page(chat_id, limit, before_id=None, after_id=None):
+    """
+    Bis zu limit + 1 Einträge in Leserichtung (neueste zuerst bzw. ab after_id
+    aufsteigend). Archivierte Einträge sind immer älter als die in
+    chat_entries; das Archiv wird daher nur gelesen, wenn die heiße Tabelle
+    die Seite nicht füllt bzw. der after-Cursor selbst archiviert ist.
+    """
+    if after_id is not None:
+        cursor = _chat_cursor(chat_id, after_id)
+        models = (ChatEntryArchive, ChatEntry) if cursor[2] else (ChatEntry,)
+    else:
+        cursor = _chat_cursor(chat_id, before_id) if before_id is not None else None
+        models = (ChatEntryArchive,) if cursor and cursor[2] else (ChatEntry, ChatEntryArchive)
+
+    rows = []
+    for model in models:
+        if len(rows) > limit:
+            break
+        query = model.query.filter_by(chat_id=chat_id)
+        if after_id is not None:
+            query = query.filter(_chat_entries_after(model, cursor))
+            query = query.order_by(model.datetime, model.id)
+        else:
+            if cursor is not None:
+                query = query.filter(_chat_entries_before(model, cursor))
+            query = query.order_by(model.datetime.desc(), model.id.desc())
+        rows += query.limit(limit + 1 - len(rows)).all()
+    return rows
+
+
 @api_bp.route("/chats/<int:chat_id>/entries", methods=["GET", "POST"])
 @jwt_required()
 def chat_entries_collection(chat_id):
@@ -488,17 +756,103 @@ def chat_entries_collection(chat_id):
     if request.method == "POST":
         data = get_json()
         sender = SenderEnum(data["sender"])
-        entry = ChatEntry(
-            chat=chat,
-            sender=sender,
-            text=data["text"],
+        return jsonify(persist_message(chat.id, data["text"], sender)), 201
+
+    # Cursor-Pagination über (datetime, id):
+    # ohne Cursor -> die neuesten `limit` Einträge,
+    # ?before=<entry_id> -> ältere Seite, ?after=<entry_id> -> neuere Seite.
+    # Einträge einer Seite sind immer chronologisch sortiert.
+    limit = _chat_page_limit()
+    before_id = request.args.get("before", type=int)
+    after_id = request.args.get("after", type=int)
+    if before_id is not None and after_id is not None:
+        abort(400, description="Use either 'before' or 'after', not both")
+
+    rows = _chat_page(chat_id, limit, before_id, after_id)
+    has_more = len(rows) > limit
+    entries = rows[:limit]
+    if after_id is None:
+        entries.reverse()
+
+    return jsonify({
+        "entries": [e.to_dict() for e in entries],
+        "has_more": has_more,
+        # Cursor für die nächste ältere bzw. neuere Seite
+        "before": entries[0].id if entries else before_id,
+        "after": entries[-1].id if entries else after_id,
+    })
+
+
+def _chat_entries_since(chat_id, since_id, limit):
+    """
+    Bis zu limit + 1 Einträge neuer als since_id, aufsteigend. Der Normalfall
+    (since-Eintrag liegt in chat_entries) liest nur die heiße Tabelle über den
+    (chat_id, datetime, id)-Index. Ist der Eintrag dort nicht (mehr) zu finden,
+    wird über die id gefiltert; das Archiv nur, wenn since älter ist als der
+    älteste heiße Eintrag.
+    """
+    since_dt = db.session.query(ChatEntry.datetime).filter_by(id=since_id, chat_id=chat_id).scalar()
+    if since_dt is not None:
+        return (
+            ChatEntry.query.filter_by(chat_id=chat_id)
+            .filter(_chat_entries_after(ChatEntry, (since_dt, since_id, False)))
+            .order_by(ChatEntry.datetime, ChatEntry.id)
+            .limit(limit + 1)
+            .all()
         )
-        db.session.add(entry)
-        db.session.commit()
-        return jsonify(entry.to_dict()), 201
 
-    entries = ChatEntry.query.filter_by(chat_id=chat_id).order_by(ChatEntry.datetime).all()
-    return jsonify([e.to_dict() for e in entries])
+    # since-Eintrag gelöscht oder archiviert
+    oldest_hot_id = (
+        db.session.query(ChatEntry.id)
+        .filter_by(chat_id=chat_id)
+        .order_by(ChatEntry.datetime, ChatEntry.id)
+        .limit(1)
+        .scalar()
+    )
+    models = (ChatEntry,)
+    if oldest_hot_id is None or since_id < oldest_hot_id:
+        models = (ChatEntryArchive, ChatEntry)
+
+    rows = []
+    for model in models:
+        if len(rows) > limit:
+            break
+        rows += (
+            model.query.filter(model.chat_id == chat_id, model.id > since_id)
+            .order_by(model.datetime, model.id)
+            .limit(limit + 1 - len(rows))
+            .all()
+        )
+    return rows
+
+
+@api_bp.route("/chats/<int:chat_id>/entries/delta", methods=["GET"])
+@jwt_required()
+def chat_entries_delta(chat_id):
+    """
+    Nur Einträge, die neuer sind als ?since=<entry_id> (für günstiges Polling).
+    Ohne since werden die neuesten Einträge geliefert.
+    """
+    Chatverlauf.query.get_or_404(chat_id)
+
+    limit = _chat_page_limit()
+    since_id = request.args.get("since", type=int)
+
+    if since_id is None:
+        # Die neuesten Einträge; neuere als diese gibt es (noch) nicht
+        entries = _chat_page(chat_id, limit)[:limit]
+        entries.reverse()
+        has_more = False
+    else:
+        rows = _chat_entries_since(chat_id, since_id, limit)
+        entries = rows[:limit]
+        has_more = len(rows) > limit
+
+    return jsonify({
+        "entries": [e.to_dict() for e in entries],
+        "has_more": has_more,
+        "last_id": entries[-1].id if entries else since_id,
+    })
 
 
 @api_bp.route("/chats/<int:chat_id>/entries/<int:entry_id>", methods=["DELETE"])
@@ -508,288 +862,88 @@ def chat_entry_detail(chat_id, entry_id):
     Chatverlauf.query.get_or_404(chat_id)
 
     entry = ChatEntry.query.filter_by(id=entry_id, chat_id=chat_id).first()
+    if entry is None:
+        entry = ChatEntryArchive.query.filter_by(id=entry_id, chat_id=chat_id).first()
     if entry is None:
         abort(404, description="Chat entry not found")
 
     db.session.delete(entry)
     db.session.commit()
+    invalidate_chat_context(chat_id)
     return jsonify({"message": f"Chat entry {entry_id} in chat {chat_id} deleted"}), 200
 
 
-@api_bp.route("/chatbot/stock", methods=["POST"])
-def chatbot_stock_assistant():
-    data = get_json()
-    message = (data.get("message") or "").strip()
-    stock_payload = data.get("stock") or {}
-    history = data.get("history") or []
-
-    if not message:
-        abort(400, description="Field 'message' is required")
-
-    symbol = (
-        stock_payload.get("symbol")
-        or stock_payload.get("ticker")
-        or stock_payload.get("isin")
-        or "dieser Aktie"
-    )
-    display_name = (
-        stock_payload.get("name")
-        or stock_payload.get("shortName")
-        or stock_payload.get("longName")
-        or symbol
-    )
+def _chatbot_response(data, message, context, chat_id=None):
+    tokens = get_generator().stream(message, context)
 
-    # Dummy response that references latest user input and current stock context
-    summary_hint = "" if not history else " Ich berücksichtige den bisherigen Verlauf."
-    stock_descriptor = f"{display_name} ({symbol})" if display_name != symbol else display_name
-    reply = (
-        f"Zu {stock_descriptor}: Ich kann dir einen allgemeinen Hinweis geben. "
-        f"Deine Frage war: '{message}'.{summary_hint}"
-    )
+    if data.get("stream") or request.accept_mimetypes.best == "text/event-stream":
+        return stream_reply_response(tokens, chat_id)
 
-    return jsonify({
+    reply = "".join(tokens)
+    response = {
         "reply": reply,
         "timestamp": datetime.utcnow().isoformat() + "Z",
-    }), 200
-
-
-# ======================
-#      Market-Data
-# ======================
-@api_bp.route("/marketdata", methods=["GET"])
-def marketdata():
-    symbol = request.args.get("symbol")
-    if not symbol:
-        abort(400, description="Query parameter 'symbol' is required (e.g., AAPL, MSFT, BMW.DE).")
-
-    # Default values if not provided
-    period = request.args.get("range", "1mo")
-    interval = request.args.get("interval", "1d")
-
-    # -------- Caching-Logik --------
-    cache_key = (symbol, period, interval)
-    now = _now_utc()
-    cache_entry = MARKETDATA_CACHE.get(cache_key)
-
-    # TTL z.B. 5 Minuten
-    ttl_seconds = 300
-
-    if cache_entry and cache_entry["expires_at"] > now:
-        # Direkt aus Cache antworten
-        return jsonify(cache_entry["payload"]), 200
-
-    # -------- Wenn nicht im Cache oder abgelaufen: frische Daten holen --------
-    try:
-        ticker = yf.Ticker(symbol)
-        hist = ticker.history(period=period, interval=interval)
-    except Exception as e:
-        abort(500, description=f"Error fetching market data: {str(e)}")
-
-    if hist.empty:
-        abort(404, description=f"No market data found for symbol '{symbol}'.")
-
-    data = []
-    for ts, row in hist.iterrows():
-        data.append({
-            "datetime": ts.isoformat(),
-            "open": float(row["Open"]),
-            "high": float(row["High"]),
-            "low": float(row["Low"]),
-            "close": float(row["Close"]),
-            "volume": int(row["Volume"]) if not (row["Volume"] != row["Volume"]) else None,  # handle NaN
-        })
-
-    payload = {
-        "symbol": symbol,
-        "range": period,
-        "interval": interval,
-        "data": data,
     }
+    if chat_id is not None:
+        response["entry"] = persist_message(chat_id, reply, SenderEnum.AI)
 
-    # In Cache speichern
-    MARKETDATA_CACHE[cache_key] = {
-        "expires_at": now + timedelta(seconds=ttl_seconds),
-        "payload": payload,
-    }
-
-    return jsonify(payload), 200
-
-# ======================
-#      Company-Info
-# ======================
+    return jsonify(response), 200
 
-@api_bp.route("/companyinfo", methods=["GET"])
-def companyinfo():
-    symbol = request.args.get("symbol")
-    if not symbol:
-        abort(400, description="Query parameter 'symbol' is required (e.g., AAPL, MSFT, BMW.DE).")
-
-    try:
-        ticker = yf.Ticker(symbol)
-
-        info = {}
-
-        if hasattr(ticker, "info") and isinstance(ticker.info, dict):
-            info = ticker.info or {}
-        else:
-            basic = getattr(ticker, "basic_info", {}) or {}
-            fast = getattr(ticker, "fast_info", {}) or {}
 
-            info = {**basic, **fast}
-
-        if not info:
-            abort(404, description=f"No company data found for symbol '{symbol}'.")
-
-    except Exception as e:
-        abort(500, description=f"Error fetching company information: {str(e)}")
-
-    return jsonify({
-        "symbol": symbol,
-        "company_data": info
-    }), 200
-
-@api_bp.route("/aktie/search", methods=["GET"])
-def aktie_search():
-    """
-    Suche nach Aktien über Namen/Firma/Symbol mit yfinance.
-    - 1x yf.Search(...) für die eigentliche Suche
-    - danach pro gefundenem Symbol ein yf.Ticker(symbol).info Call, um ISIN zu holen
-    Antwort: nur Aktien-Daten (quotes), angereichert um 'ticker' und 'isin'.
-    """
-    # Name aus Query-Param holen: ?name=Apple oder ?q=Apple
-    query = request.args.get("name") or request.args.get("q")
-    if not query:
-        abort(400, description="Query parameter 'name' (oder 'q') ist erforderlich, z.B. ?name=Apple")
-
-    try:
-        # 1. API-Call: Suche nach passenden Symbolen
-        search = yf.Search(query, max_results=10)
-        quotes = search.quotes or []
-    except Exception as e:
-        abort(500, description=f"Fehler bei der Aktie-Suche: {str(e)}")
-
-    if not quotes:
-        abort(404, description=f"Keine Aktien-Treffer für '{query}' gefunden.")
-
-    # 2. Für jedes gefundene Symbol ISIN nachladen
-    #    (zusätzlicher API-Call pro Symbol)
-    for q in quotes:
-        symbol = q.get("symbol")
-        isin = None
-
-        if symbol:
-            try:
-                ticker_obj = yf.Ticker(symbol)
-                info = getattr(ticker_obj, "info", {}) or {}
-                # je nach Datenquelle kann der Key 'isin' oder 'ISIN' heißen oder gar nicht existieren
-                isin = info.get("isin") or info.get("ISIN")
-            except Exception:
-                isin = None  # Wenn etwas schiefgeht, ISIN einfach leer lassen
-
-        # ticker-Feld explizit setzen (alias für symbol)
-        q["ticker"] = symbol
-        # ISIN-Feld ergänzen
-        q["isin"] = isin
-
-    # Nur Aktien-Daten zurückgeben
-    return jsonify({
-        "query": query,
-        "quotes": quotes
-    }), 200
-
-@api_bp.route("/aktie/trending", methods=["GET"])
-def aktie_trending():
+@api_bp.route("/chatbot/stock", methods=["POST"])
+def chatbot_stock_assistant():
     """
-    Liefert Trending-Aktien von Yahoo Finance.
-    - Holt Trending-List direkt vom Yahoo-Endpoint (über requests)
-    - Anreichern der Ticker mit Details über yfinance.Ticker(...).info
-    - Gibt je Aktie u.a. Ticker, ISIN, Namen, Exchange, Sector, Industry, Preis zurück.
+    Antwort des Aktien-Chatbots.
+    - {"stream": true} oder Accept: text/event-stream -> Tokens als SSE-Stream
+    - mit "chat_id" (JWT nötig) wird der Kontext serverseitig aus dem gespeicherten
+      Verlauf gebaut; "stock"/"history" werden dann nicht mehr gebraucht.
+      Frage und Antwort werden als ChatEntry gespeichert.
     """
+    data = get_json()
+    message = (data.get("message") or "").strip()
+    stock_payload = data.get("stock") or {}
+    history = data.get("history") or []
 
-    # Optionaler Query-Parameter: Region (Standard: US)
-    region = request.args.get("region", "US")
-    url = f"https://query1.finance.yahoo.com/v1/finance/trending/{region}"
-
-    headers = {
-        "User-Agent": "Mozilla/5.0"
-    }
+    if not message:
+        abort(400, description="Field 'message' is required")
 
-    # 1) Trending-Daten von Yahoo holen
-    try:
-        resp = requests.get(url, headers=headers, timeout=10)
-        resp.raise_for_status()
-        data = resp.json()
-    except Exception as e:
-        abort(500, description=f"Fehler beim Abrufen der Trending-Aktien: {str(e)}")
+    chat_id = data.get("chat_id")
+    if chat_id is None:
+        context = build_stock_context(stock_payload, history)
+        return _chatbot_response(data, message, context)
 
-    # 2) Quotes aus der Antwort extrahieren
-    try:
-        results = data.get("finance", {}).get("result", [])
-        if not results:
-            abort(404, description=f"Keine Trending-Daten für Region '{region}' gefunden.")
-
-        quotes = results[0].get("quotes", [])
-    except Exception:
-        abort(500, description="Antwortformat von Yahoo Finance unerwartet.")
-
-    if not quotes:
-        abort(404, description=f"Keine Trending-Aktien für Region '{region}' gefunden.")
-
-    # 3) Für jeden Ticker Details + ISIN via yfinance holen
-    enriched = []
-    for q in quotes:
-        symbol = q.get("symbol")
-        info = {}
-        if symbol:
-            try:
-                ticker_obj = yf.Ticker(symbol)
-                info = getattr(ticker_obj, "info", {}) or {}
-            except Exception:
-                info = {}
-
-        enriched.append({
-            # Basis
-            "symbol": symbol,
-            "ticker": symbol,
-
-            # Namen
-            "shortname": (
-                info.get("shortName")
-                or q.get("shortName")
-                or q.get("shortname")
-            ),
-            "longname": (
-                info.get("longName")
-                or q.get("longName")
-                or q.get("longname")
-            ),
-
-            # Börse / Markt
-            "exchange": (
-                info.get("exchange")
-                or q.get("fullExchangeName")
-                or q.get("exchange")
-            ),
-
-            # Finanzdaten
-            "currency": info.get("currency"),
-            "sector": info.get("sector"),
-            "industry": info.get("industry"),
-            "quoteType": info.get("quoteType") or q.get("quoteType"),
-            "regularMarketPrice": info.get("regularMarketPrice"),
-            "regularMarketChangePercent": info.get("regularMarketChangePercent"),
-
-            # ISIN (falls verfügbar)
-            "isin": info.get("isin") or info.get("ISIN"),
-
-            # optional: der rohe Trending-Eintrag von Yahoo
-            "raw_trending": q,
-        })
+    verify_jwt_in_request()
+    chat = Chatverlauf.query.get_or_404(chat_id)
+    if chat.user_id != int(get_jwt_identity()):
+        return jsonify({"error": "Not authorized - Not your chat."}), 403
+    if chat.type != ChatTypeEnum.AKTIE:
+        abort(400, description="Chat is not a stock chat")
 
-    return jsonify({
-        "region": region,
-        "count": len(enriched),
-        "results": enriched,
-    }), 200
+    context = build_chat_context(chat)
+    persist_message(chat.id, message)
+    return _chatbot_response(data, message, context, chat.id)
 
 
+@api_bp.route("/chatbot/portfolio", methods=["POST"])
+@jwt_required()
+def chatbot_portfolio_assistant():
+    """
+    Antwort des Portfolio-Chatbots für einen gespeicherten Portfolio-Chat.
+    Body: {"chat_id": ..., "message": ..., "stream": optional}
+    """
+    data = get_json()
+    message = (data.get("message") or "").strip()
+    if not message:
+        abort(400, description="Field 'message' is required")
+    if "chat_id" not in data:
+        abort(400, description="Field 'chat_id' is required")
+
+    chat = Chatverlauf.query.get_or_404(data["chat_id"])
+    if chat.user_id != int(get_jwt_identity()):
+        return jsonify({"error": "Not authorized - Not your chat."}), 403
+    if chat.type != ChatTypeEnum.PORTFOLIO:
+        abort(400, description="Chat is not a portfolio chat")
+
+    context = build_chat_context(chat)
+    persist_message(chat.id, message)
+    return _chatbot_response(data, message, context, chat.id)
@@ -0,0 +1,90 @@
+"""
+Passwort-Hashing außerhalb des Request-Threads.
+
+generate_password_hash/check_password_hash sind absichtlich CPU-teuer und
+halten den GIL. Sie laufen deshalb in einem begrenzten Prozess-Pool
+(PASSWORD_HASH_WORKERS); der Request-Thread wartet nur auf das Ergebnis, und
+andere Threads im Worker laufen währenddessen weiter.
+
+Verfahren und Kosten kommen aus Config.PASSWORD_HASH_METHOD (werkzeug-Format,
+z.B. "scrypt:32768:8:1" oder "pbkdf2:sha256:600000"). Hashes mit anderen
+Parametern werden beim nächsten Login transparent neu erzeugt (needs_rehash).
+"""
+import atexit
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from flask import current_app
+from werkzeug.security import check_password_hash, generate_password_hash
+
+_executor = None
+_executor_lock = threading.Lock()
+
+# Konfigurierte Methode -> Präfix, das werkzeug tatsächlich in den Hash schreibt
+_method_prefixes = {}
+
+
+def _get_executor(workers: int):
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # "spawn": kein fork eines Prozesses mit offenen DB-Verbindungen und Threads.
+            # Eigene Startskripte brauchen dafür den üblichen `if __name__ == "__main__":`-Guard.
+            _executor = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+            atexit.register(_executor.shutdown, wait=False, cancel_futures=True)
+        return _executor
+
+
+def _drop_executor(broken):
+    """Verwirft einen kaputten Pool (z.B. Worker per OOM-Kill beendet); der nächste Aufruf legt einen neuen an."""
+    global _executor
+    with _executor_lock:
+        if _executor is broken:
+            _executor = None
+    broken.shutdown(wait=False, cancel_futures=True)
+
+
+def _run(fn, *args, **kwargs):
+    workers = current_app.config["PASSWORD_HASH_WORKERS"]
+    if workers <= 0:
+        return fn(*args, **kwargs)
+    for _attempt in range(2):
+        executor = _get_executor(workers)
+        try:
+            return executor.submit(fn, *args, **kwargs).result()
+        except BrokenProcessPool:
+            current_app.logger.warning("Passwort-Hash-Pool defekt, wird neu gestartet", exc_info=True)
+            _drop_executor(executor)
+    # Auch der neue Pool ist sofort ausgefallen -> im Request-Thread rechnen
+    return fn(*args, **kwargs)
+
+
+def hash_password(raw_password: str) -> str:
+    method = current_app.config["PASSWORD_HASH_METHOD"]
+    return _run(generate_password_hash, raw_password, method=method)
+
+
+def verify_password(password_hash: str, raw_password: str) -> bool:
+    return _run(check_password_hash, password_hash, raw_password)
+
+
+def _method_prefix(method: str) -> str:
+    """
+    Präfix eines Hashes für die konfigurierte Methode, inkl. der von werkzeug
+    ergänzten Default-Parameter ("scrypt" -> "scrypt:32768:8:1").
+    """
+    prefix = _method_prefixes.get(method)
+    if prefix is None:
+        prefix = generate_password_hash("", method=method).split("$", 1)[0]
+        _method_prefixes[method] = prefix
+    return prefix
+
+
+def needs_rehash(password_hash: str) -> bool:
+    method = current_app.config["PASSWORD_HASH_METHOD"]
+    return password_hash.split("$", 1)[0] != _method_prefix(method)
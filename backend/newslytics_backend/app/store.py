@@ -0,0 +1,247 @@
+"""
+Geteilter Market-Data-Store in der Datenbank.
+
+Die In-Memory-Caches in market.py gelten nur pro Prozess. Dieser Store liegt
+dahinter und wird von allen Web-Workern und dem Prefetch-Worker
+(`flask prefetch`, siehe prefetch.py) gemeinsam genutzt:
+- market_cache: JSON-Ergebnisse mit Ablaufzeit (Quotes, Trending, ISIN -> Ticker)
+- price_bars / price_series: Tages-Bars je Symbol, werden fortgeschrieben
+  statt bei jedem Abruf komplett neu geladen
+
+Zugriffe laufen über eigene Verbindungen (nicht über db.session), damit sie
+keine offenen Änderungen eines Requests mitcommitten. DB-Fehler werden nur
+geloggt: der Store ist ein Cache, ohne ihn geht es direkt zum Upstream.
+"""
+import math
+from datetime import datetime, timedelta
+
+from flask import current_app, has_app_context
+from sqlalchemy import delete, insert, select
+from sqlalchemy.exc import SQLAlchemyError
+
+from .models import db, MarketCacheEntry, PriceBar, PriceSeries
+
+# Nur diese Intervalle landen im Bar-Store (Intraday-Bars bleiben im Prozess-Cache)
+STORE_INTERVALS = ("1d",)
+
+_PERIOD_OFFSETS = {
+    "1mo": {"months": 1},
+    "3mo": {"months": 3},
+    "6mo": {"months": 6},
+    "1y": {"years": 1},
+    "2y": {"years": 2},
+    "5y": {"years": 5},
+    "10y": {"years": 10},
+}
+MAX_PERIOD_START = datetime(1900, 1, 1)
+
+
+def period_start(period: str, now: datetime):
+    """
+    Beginn eines yfinance-Zeitraums (UTC, naiv). None für Zeiträume, die in
+    Handelstagen statt Kalendertagen zählen (1d, 5d) -> nicht aus dem Store.
+    """
+    if period == "max":
+        return MAX_PERIOD_START
+    if period == "ytd":
+        return datetime(now.year, 1, 1)
+    offset = _PERIOD_OFFSETS.get(period)
+    if offset is None:
+        return None
+    import pandas as pd
+
+    return (pd.Timestamp(now) - pd.DateOffset(**offset)).to_pydatetime()
+
+
+def covering_period(start: datetime, now: datetime) -> str:
+    """Kleinster yfinance-Zeitraum, der ab `start` alles abdeckt (auf den Tag genau)."""
+    if start >= now - timedelta(days=4):
+        return "5d"
+    for period in _PERIOD_OFFSETS:
+        if period_start(period, now) <= start + timedelta(days=1):
+            return period
+    return "max"
+
+
+def _warn(message: str):
+    current_app.logger.warning(message, exc_info=True)
+
+
+# ------- Key/Value-Einträge -------
+
+def read_entries(keys, now: datetime) -> dict:
+    """{key: {"payload", "expires_at"}} aller noch gültigen Einträge (eine Query)."""
+    keys = list(keys)
+    if not keys or not has_app_context():
+        return {}
+    try:
+        with db.engine.connect() as conn:
+            rows = conn.execute(
+                select(MarketCacheEntry.key, MarketCacheEntry.payload, MarketCacheEntry.expires_at)
+                .where(MarketCacheEntry.key.in_(keys), MarketCacheEntry.expires_at > now)
+            ).all()
+    except SQLAlchemyError:
+        _warn("Market-Store nicht lesbar")
+        return {}
+    return {key: {"payload": payload, "expires_at": expires_at} for key, payload, expires_at in rows}
+
+
+def write_entries(items: dict, ttl_seconds: float, now: datetime):
+    """Schreibt {key: payload} mit gemeinsamer Ablaufzeit (ersetzt vorhandene Einträge)."""
+    if not items or not has_app_context():
+        return
+    expires_at = now + timedelta(seconds=ttl_seconds)
+    try:
+        with db.engine.begin() as conn:
+            conn.execute(delete(MarketCacheEntry).where(MarketCacheEntry.key.in_(list(items))))
+            conn.execute(insert(MarketCacheEntry), [
+                {"key": key, "payload": payload, "expires_at": expires_at, "updated_at": now}
+                for key, payload in items.items()
+            ])
+    except SQLAlchemyError:
+        _warn("Market-Store nicht schreibbar")
+
+
+# ------- Kurs-Bars -------
+
+def _utc_naive(index):
+    if index.tz is not None:
+        index = index.tz_convert("UTC").tz_localize(None)
+    return [ts.to_pydatetime() for ts in index]
+
+
+def _bar_rows(symbol: str, interval: str, hist, timestamps):
+    rows = []
+    for ts, o, h, l, c, v in zip(
+        timestamps,
+        hist["Open"].tolist(),
+        hist["High"].tolist(),
+        hist["Low"].tolist(),
+        hist["Close"].tolist(),
+        hist["Volume"].tolist() if "Volume" in hist else [None] * len(timestamps),
+    ):
+        rows.append({
+            "symbol": symbol,
+            "interval": interval,
+            "ts": ts,
+            "open": float(o),
+            "high": float(h),
+            "low": float(l),
+            "close": float(c),
+            "volume": int(v) if v is not None and v == v else None,
+        })
+    return rows
+
+
+def save_bars(symbol: str, interval: str, hist, covered_from: datetime, now: datetime) -> bool:
+    """
+    Übernimmt frisch geladene Bars (Zeitraum ab covered_from) in den Store.
+    Überlappt der Abruf die gespeicherte Reihe, wird sie fortgeschrieben.
+    Sonst, oder wenn sich ältere Kurse rückwirkend geändert haben
+    (Split/Dividende, auto_adjust), wird die Reihe ersetzt, sofern der Abruf
+    sie komplett abdeckt; andernfalls False (der Aufrufer muss den ganzen
+    Zeitraum neu laden).
+    """
+    if interval not in STORE_INTERVALS or hist is None or hist.empty or not has_app_context():
+        return True
+
+    timestamps = _utc_naive(hist.index)
+    first_ts = timestamps[0]
+    rows = _bar_rows(symbol, interval, hist, timestamps)
+    series_key = (PriceSeries.symbol == symbol, PriceSeries.interval == interval)
+    bar_key = (PriceBar.symbol == symbol, PriceBar.interval == interval)
+
+    try:
+        with db.engine.begin() as conn:
+            series = conn.execute(select(PriceSeries).where(*series_key)).first()
+
+            extend = series is not None and series.last_ts >= first_ts
+            if extend:
+                stored = dict(conn.execute(
+                    select(PriceBar.ts, PriceBar.close)
+                    .where(*bar_key, PriceBar.ts >= first_ts, PriceBar.ts < series.last_ts)
+                ).all())
+                fetched = {row["ts"]: row["close"] for row in rows}
+                adjusted = any(
+                    ts in fetched and not math.isclose(close, fetched[ts], rel_tol=1e-6)
+                    for ts, close in stored.items()
+                )
+                extend = not adjusted
+
+            if not extend and series is not None and covered_from > series.covered_from:
+                # Ersetzen würde ältere Bars verlieren -> Aufrufer lädt den ganzen Zeitraum
+                return False
+
+            if extend:
+                conn.execute(delete(PriceBar).where(*bar_key, PriceBar.ts >= first_ts))
+                covered_from = min(covered_from, series.covered_from)
+            else:
+                conn.execute(delete(PriceBar).where(*bar_key))
+
+            conn.execute(insert(PriceBar), rows)
+            conn.execute(delete(PriceSeries).where(*series_key))
+            conn.execute(insert(PriceSeries), [{
+                "symbol": symbol,
+                "interval": interval,
+                "timezone": str(hist.index.tz) if hist.index.tz is not None else None,
+                "covered_from": covered_from,
+                "last_ts": timestamps[-1],
+                "updated_at": now,
+            }])
+    except SQLAlchemyError:
+        _warn(f"Kurs-Bars für {symbol} nicht gespeichert")
+    return True
+
+
+def load_bars(symbol: str, interval: str, start: datetime, max_age_seconds: float, now: datetime):
+    """
+    DataFrame (Open/High/Low/Close/Volume) ab `start` aus dem Store oder None,
+    wenn die Reihe fehlt, den Zeitraum nicht abdeckt oder älter als max_age ist.
+    """
+    if interval not in STORE_INTERVALS or not has_app_context():
+        return None
+    try:
+        with db.engine.connect() as conn:
+            series = conn.execute(
+                select(PriceSeries).where(PriceSeries.symbol == symbol, PriceSeries.interval == interval)
+            ).first()
+            if (
+                series is None
+                or series.covered_from > start
+                or series.updated_at < now - timedelta(seconds=max_age_seconds)
+            ):
+                return None
+            rows = conn.execute(
+                select(PriceBar.ts, PriceBar.open, PriceBar.high, PriceBar.low, PriceBar.close, PriceBar.volume)
+                .where(PriceBar.symbol == symbol, PriceBar.interval == interval, PriceBar.ts >= start)
+                .order_by(PriceBar.ts)
+            ).all()
+    except SQLAlchemyError:
+        _warn(f"Kurs-Bars für {symbol} nicht lesbar")
+        return None
+    if not rows:
+        return None
+
+    import pandas as pd
+
+    ts, opens, highs, lows, closes, volumes = zip(*rows)
+    index = pd.DatetimeIndex(ts).tz_localize("UTC")
+    if series.timezone:
+        index = index.tz_convert(series.timezone)
+    return pd.DataFrame({
+        "Open": opens,
+        "High": highs,
+        "Low": lows,
+        "Close": closes,
+        "Volume": [float("nan") if v is None else float(v) for v in volumes],
+    }, index=index)
+
+
+def stored_series(interval: str):
+    """Alle gespeicherten Reihen eines Intervalls: [(symbol, covered_from, last_ts)]."""
+    with db.engine.connect() as conn:
+        return conn.execute(
+            select(PriceSeries.symbol, PriceSeries.covered_from, PriceSeries.last_ts)
+            .where(PriceSeries.interval == interval)
+            .order_by(PriceSeries.symbol)
+        ).all()
@@ -0,0 +1,68 @@
+"""
+Server-Sent Events: Push von neuen Chat-Einträgen und Kurs-Updates.
+
+GET /api/stream?chat_id=<id>&symbols=AAPL,MSFT
+
+EventSource kann keine Header setzen, daher darf das JWT für Chat-Abos auch
+als ?jwt=<token> übergeben werden. Reine Kurs-Abos sind (wie /marketdata)
+ohne Login möglich.
+"""
+from flask import Blueprint, Response, abort, current_app, jsonify, request
+from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
+
+from .events import broker, format_sse
+from .market import QUOTE_CACHE, QUOTE_POLLER
+from .models import Chatverlauf
+
+stream_bp = Blueprint("stream", __name__)
+
+MAX_STREAM_SYMBOLS = 50
+
+
+@stream_bp.route("/stream", methods=["GET"])
+def stream():
+    chat_id = request.args.get("chat_id", type=int)
+    symbols = [s.strip() for s in request.args.get("symbols", "").split(",") if s.strip()]
+    symbols = list(dict.fromkeys(symbols))
+
+    if chat_id is None and not symbols:
+        abort(400, description="Query parameter 'chat_id' and/or 'symbols' is required")
+    if len(symbols) > MAX_STREAM_SYMBOLS:
+        abort(400, description=f"At most {MAX_STREAM_SYMBOLS} symbols per stream")
+
+    topics = []
+    if chat_id is not None:
+        verify_jwt_in_request(locations=["headers", "query_string"])
+        chat = Chatverlauf.query.get_or_404(chat_id)
+        if chat.user_id != int(get_jwt_identity()):
+            return jsonify({"error": "Not authorized - Not your chat."}), 403
+        topics.append(f"chat:{chat_id}")
+    topics.extend(f"quote:{symbol}" for symbol in symbols)
+
+    sub = broker.subscribe(topics)
+    if symbols:
+        # Ein gemeinsamer Poller pro Prozess für alle abonnierten Symbole
+        QUOTE_POLLER.ensure_running(
+            current_app.config["STREAM_QUOTE_INTERVAL"], current_app._get_current_object()
+        )
+
+    # Bereits gecachte Kurse direkt mitschicken, statt auf den nächsten Poll zu warten
+    initial = [QUOTE_CACHE[s]["quote"] for s in symbols if s in QUOTE_CACHE]
+    keepalive_seconds = current_app.config["STREAM_KEEPALIVE_SECONDS"]
+
+    def generate():
+        try:
+            yield "retry: 3000\n\n"
+            for quote in initial:
+                yield format_sse("quote", quote)
+            while True:
+                message = sub.get(timeout=keepalive_seconds)
+                yield message if message is not None else ": keepalive\n\n"
+        finally:
+            broker.unsubscribe(sub)
+
+    return Response(
+        generate(),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,240 @@
+"""
+Schutz für alle Upstream-Aufrufe (Yahoo Finance).
+
+Jeder Aufruf läuft über UPSTREAM.call(...):
+- Token-Bucket (prozessweit): höchstens UPSTREAM_RATE_PER_SECOND Aufrufe im
+  Mittel, Bursts bis UPSTREAM_BURST. Ist kein Token frei, wird höchstens
+  UPSTREAM_MAX_WAIT_SECONDS gewartet, danach schlägt der Aufruf sofort fehl.
+- Circuit-Breaker: Liegt die Fehlerquote der letzten UPSTREAM_BREAKER_WINDOW
+  Aufrufe über UPSTREAM_BREAKER_ERROR_RATE, werden Aufrufe für
+  UPSTREAM_BREAKER_OPEN_SECONDS gar nicht erst abgeschickt. Danach darf ein
+  einzelner Probe-Aufruf durch (half-open); klappt er, schließt der Breaker.
+
+Abgelehnte Aufrufe werfen UpstreamUnavailable. Die Aufrufer in market.py
+liefern dann, wenn vorhanden, abgelaufene Cache-Einträge aus (stale) statt
+eines Fehlers. Zustand und Zähler: UPSTREAM.metrics() bzw. /api/upstream/metrics.
+"""
+import threading
+import time
+from collections import deque
+
+
+class UpstreamUnavailable(Exception):
+    """Upstream-Aufruf wurde nicht ausgeführt (Rate-Limit oder offener Circuit-Breaker)."""
+
+    def __init__(self, reason: str, retry_after: float = None):
+        super().__init__(reason)
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    def __init__(self, rate_per_second: float, burst: int):
+        self.rate = rate_per_second
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, cost: float = 1, max_wait: float = 0) -> bool:
+        """
+        Nimmt `cost` Tokens (max. burst). Wartet dafür höchstens max_wait
+        Sekunden; False, wenn das nicht reicht (dann wird nichts abgebucht).
+        """
+        cost = min(cost, self.burst)
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            wait = (cost - self._tokens) / self.rate if self._tokens < cost else 0.0
+            if wait > max_wait:
+                return False
+            # Tokens sofort reservieren, damit parallele Aufrufer sich hinten anstellen
+            self._tokens -= cost
+        if wait > 0:
+            time.sleep(wait)
+        return True
+
+    def tokens(self) -> float:
+        with self._lock:
+            self._refill(time.monotonic())
+            return self._tokens
+
+
+class CircuitBreaker:
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, window: int, min_calls: int, error_rate: float, open_seconds: float):
+        self.min_calls = min_calls
+        self.error_rate = error_rate
+        self.open_seconds = open_seconds
+        self._outcomes = deque(maxlen=window)  # True = Fehler
+        self._state = self.CLOSED
+        self._opened_at = None
+        self._probe_running = False
+        self._times_opened = 0
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """None, wenn der Aufruf durch darf, sonst die Sekunden bis zum nächsten Versuch."""
+        with self._lock:
+            if self._state == self.CLOSED:
+                return None
+            remaining = self._opened_at + self.open_seconds - time.monotonic()
+            if self._state == self.OPEN and remaining <= 0:
+                self._state = self.HALF_OPEN
+            if self._state == self.HALF_OPEN and not self._probe_running:
+                self._probe_running = True
+                return None
+            return max(remaining, 1.0)
+
+    def record(self, failed: bool):
+        with self._lock:
+            if self._state == self.HALF_OPEN:
+                self._probe_running = False
+                if failed:
+                    self._open()
+                else:
+                    self._state = self.CLOSED
+                    self._outcomes.clear()
+                return
+
+            self._outcomes.append(failed)
+            if (
+                self._state == self.CLOSED
+                and len(self._outcomes) >= self.min_calls
+                and sum(self._outcomes) / len(self._outcomes) >= self.error_rate
+            ):
+                self._open()
+
+    def release_probe(self):
+        """Gibt den Probe-Slot frei, wenn der Aufruf gar nicht abgeschickt wurde."""
+        with self._lock:
+            self._probe_running = False
+
+    def _open(self):
+        self._state = self.OPEN
+        self._opened_at = time.monotonic()
+        self._times_opened += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            outcomes = list(self._outcomes)
+            open_for = None
+            if self._state != self.CLOSED:
+                open_for = max(0.0, self._opened_at + self.open_seconds - time.monotonic())
+            return {
+                "state": self._state,
+                "error_rate": sum(outcomes) / len(outcomes) if outcomes else 0.0,
+                "window_calls": len(outcomes),
+                "times_opened": self._times_opened,
+                "retry_after_seconds": open_for,
+            }
+
+
+class UpstreamGuard:
+    """Rate-Limiter + Circuit-Breaker + Zähler pro Operation (z.B. "info", "download")."""
+
+    def __init__(self):
+        self.configure()
+
+    def configure(
+        self,
+        rate_per_second: float = 5.0,
+        burst: int = 10,
+        max_wait_seconds: float = 2.0,
+        breaker_window: int = 20,
+        breaker_min_calls: int = 10,
+        breaker_error_rate: float = 0.5,
+        breaker_open_seconds: float = 30.0,
+    ):
+        self.max_wait_seconds = max_wait_seconds
+        self.limiter = TokenBucket(rate_per_second, burst)
+        self.breaker = CircuitBreaker(breaker_window, breaker_min_calls, breaker_error_rate, breaker_open_seconds)
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def _count(self, operation: str, *fields, elapsed_ms: float = None):
+        with self._lock:
+            stats = self._stats.setdefault(operation, {
+                "calls": 0, "errors": 0, "rejected": 0, "stale_served": 0,
+                "total_ms": 0.0, "max_ms": 0.0,
+            })
+            for field in fields:
+                stats[field] += 1
+            if elapsed_ms is not None:
+                stats["total_ms"] += elapsed_ms
+                stats["max_ms"] = max(stats["max_ms"], elapsed_ms)
+
+    def call(self, operation: str, fn, *args, cost: float = 1, **kwargs):
+        retry_after = self.breaker.allow()
+        if retry_after is not None:
+            self._count(operation, "rejected")
+            raise UpstreamUnavailable("Upstream circuit breaker is open", retry_after)
+
+        if not self.limiter.acquire(cost, self.max_wait_seconds):
+            self._count(operation, "rejected")
+            # Kein Upstream-Fehler: einen evtl. reservierten Probe-Aufruf wieder freigeben
+            self.breaker.release_probe()
+            raise UpstreamUnavailable("Upstream rate limit exceeded", 1.0 / self.limiter.rate)
+
+        started = time.perf_counter()
+        try:
+            result = fn(*args, **kwargs)
+        except Exception:
+            self._count(operation, "calls", "errors", elapsed_ms=(time.perf_counter() - started) * 1000)
+            self.breaker.record(failed=True)
+            raise
+        self._count(operation, "calls", elapsed_ms=(time.perf_counter() - started) * 1000)
+        self.breaker.record(failed=False)
+        return result
+
+    def record_failures(self, operation: str, count: int = 1):
+        """
+        Fehler, die ein formal erfolgreicher Aufruf meldet (yf.download liefert
+        für fehlgeschlagene Symbole nur leere/NaN-Spalten statt einer Exception).
+        """
+        for _ in range(count):
+            self._count(operation, "errors")
+            self.breaker.record(failed=True)
+
+    def record_stale(self, operation: str):
+        self._count(operation, "stale_served")
+
+    def metrics(self) -> dict:
+        with self._lock:
+            operations = {}
+            for name, stats in self._stats.items():
+                operations[name] = {
+                    **{k: v for k, v in stats.items() if k != "total_ms"},
+                    "avg_ms": stats["total_ms"] / stats["calls"] if stats["calls"] else None,
+                }
+        return {
+            "limiter": {
+                "rate_per_second": self.limiter.rate,
+                "burst": self.limiter.burst,
+                "tokens": self.limiter.tokens(),
+                "max_wait_seconds": self.max_wait_seconds,
+            },
+            "breaker": self.breaker.snapshot(),
+            "operations": operations,
+        }
+
+
+UPSTREAM = UpstreamGuard()
+
+
+def configure_upstream(config):
+    UPSTREAM.configure(
+        rate_per_second=config["UPSTREAM_RATE_PER_SECOND"],
+        burst=config["UPSTREAM_BURST"],
+        max_wait_seconds=config["UPSTREAM_MAX_WAIT_SECONDS"],
+        breaker_window=config["UPSTREAM_BREAKER_WINDOW"],
+        breaker_min_calls=config["UPSTREAM_BREAKER_MIN_CALLS"],
+        breaker_error_rate=config["UPSTREAM_BREAKER_ERROR_RATE"],
+        breaker_open_seconds=config["UPSTREAM_BREAKER_OPEN_SECONDS"],
+    )